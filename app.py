@@ -1,98 +1,152 @@
+import startup_profiler
+# Installed before anything else is imported so the report covers every import
+startup_profiler.start_if_requested()
+
 from flet import *
-from db_utils import HospitalDB
-from datetime import datetime
-import google.generativeai as genai
+from db_utils import HospitalDB, Role, AppointmentConflict, PATIENT_PAGE_SIZE
+from change_notifier import ChangeNotifier
+from search_index import Debouncer
+from session import sessions
+from chat_store import ChatStore, CHAT_PAGE_SIZE
+from datetime import datetime, timedelta
+import assistant
 import threading
-import os
-import sys
-import subprocess
-import json
 from typing import List, Dict, Any, Optional
 import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import heapq
+import itertools
+
+# Worker threads that load dashboard panels in parallel
+DASHBOARD_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="dashboard")
+# Seconds between background dashboard refreshes (change events refresh sooner)
+DASHBOARD_REFRESH_SECONDS = 60
+
+# Type-ahead searches run once typing pauses for this long (seconds)
+SEARCH_DEBOUNCE_SECONDS = 0.25
+
+# Form saves run on this worker so the event handler returns immediately
+SAVE_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="save")
+# Debounced searches run on this worker, so they all share its database connection
+SEARCH_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="search")
+# Toast notifications: seconds on screen and how many are stacked at once
+TOAST_SECONDS = 2
+MAX_VISIBLE_TOASTS = 4
+TOAST_COLORS = {"success": Colors.GREEN_600, "error": Colors.RED_600}
+
+# Patient grid paging: columns, cards kept in the grid at once, and how close to
+# either end of the grid (pixels) the next page is fetched
+PATIENT_GRID_COLUMNS = 3
+PATIENT_WINDOW_SIZE = 150
+PATIENT_SCROLL_THRESHOLD = 600
+
+# Chat history loads the previous page when scrolled this close to the top (pixels)
+CHAT_SCROLL_THRESHOLD = 200
+# A streaming reply's bubble is re-rendered at most this often (seconds)
+STREAM_RENDER_SECONDS = 0.1
 
 class ChatManager:
-    """Manages chat storage and retrieval"""
+    """
+    Manages chat storage and retrieval.
+
+    Only chat metadata is loaded at startup, indexed by id and kept in
+    most-recently-updated order; messages are read from the store a page at a
+    time as a chat is opened and scrolled back.
+    """
     
-    def __init__(self, file_path="chat.json"):
+    def __init__(self, file_path="chat.json", store: ChatStore = None):
         self.file_path = file_path
-        self.chats = self._load_chats()
+        self.store = store or ChatStore()
+        # Chats saved by older versions are moved into the store once
+        self.store.migrate_json(file_path)
+        # chat id -> metadata, and chat ids with the most recently updated first
+        self.chats = {}
+        self.order = []
+        self.lock = threading.RLock()
+        self._load_chats()
     
-    def _load_chats(self) -> Dict[str, Any]:
-        """Load chats from JSON file"""
-        if os.path.exists(self.file_path):
-            try:
-                with open(self.file_path, 'r') as file:
-                    return json.load(file)
-            except json.JSONDecodeError:
-                # Return empty structure if file is corrupted
-                return {"chats": []}
-        return {"chats": []}
-    
-    def save_chats(self):
-        """Save chats to JSON file"""
-        with open(self.file_path, 'w') as file:
-            json.dump(self.chats, file, indent=2)
+    def _load_chats(self):
+        """Load chat metadata from the chat store"""
+        for chat in self.store.list_chats():
+            self.chats[chat["id"]] = chat
+            self.order.append(chat["id"])
+    
+    def _touch(self, chat_id: str):
+        # The chat just updated moves to the front; the rest keep their order
+        self.order.remove(chat_id)
+        self.order.insert(0, chat_id)
     
     def get_chat_list(self) -> List[Dict[str, Any]]:
-        """Get list of all chats"""
-        return self.chats.get("chats", [])
+        """Get metadata of all chats, most recently updated first"""
+        with self.lock:
+            return [self.chats[chat_id] for chat_id in self.order]
     
     def create_new_chat(self, title: str = None) -> str:
         """Create a new chat and return its ID"""
-        chat_id = f"chat_{len(self.get_chat_list()) + 1}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        
-        if not title:
-            title = f"Chat {len(self.get_chat_list()) + 1}"
-        
-        new_chat = {
-            "id": chat_id,
-            "title": title,
-            "created_at": datetime.now().isoformat(),
-            "updated_at": datetime.now().isoformat(),
-            "messages": []
-        }
-        
-        self.chats.setdefault("chats", []).append(new_chat)
-        self.save_chats()
-        return chat_id
+        with self.lock:
+            chat_id = f"chat_{len(self.chats) + 1}_{datetime.now().strftime('%Y%m%d%H%M%S')}"
+            
+            if not title:
+                title = f"Chat {len(self.chats) + 1}"
+            
+            now = datetime.now().isoformat()
+            self.chats[chat_id] = {
+                "id": chat_id,
+                "title": title,
+                "created_at": now,
+                "updated_at": now,
+                "message_count": 0,
+            }
+            self.order.insert(0, chat_id)
+            self.store.create_chat(chat_id, title, now)
+            return chat_id
     
     def get_chat(self, chat_id: str) -> Optional[Dict[str, Any]]:
-        """Get a specific chat by ID"""
-        for chat in self.get_chat_list():
-            if chat["id"] == chat_id:
-                return chat
-        return None
+        """Get a specific chat's metadata by ID"""
+        return self.chats.get(chat_id)
+    
+    def get_messages(self, chat_id: str, before=None, limit: int = CHAT_PAGE_SIZE) -> List[Dict[str, Any]]:
+        """Get a page of a chat's messages, oldest first, older than the (timestamp, id) in before"""
+        if chat_id not in self.chats:
+            return []
+        return self.store.get_messages(chat_id, before=before, limit=limit)
     
     def add_message(self, chat_id: str, sender: str, message: str):
         """Add a message to a specific chat"""
-        chat = self.get_chat(chat_id)
-        if chat:
-            chat["messages"].append({
-                "sender": sender,
-                "message": message,
-                "timestamp": datetime.now().isoformat()
-            })
-            chat["updated_at"] = datetime.now().isoformat()
+        with self.lock:
+            chat = self.chats.get(chat_id)
+            if not chat:
+                return
+            timestamp = datetime.now().isoformat()
+            chat["message_count"] += 1
+            chat["updated_at"] = timestamp
+            self._touch(chat_id)
             
             # Update title for new chats based on first user message
-            if len(chat["messages"]) == 1 and sender == "You":
+            title = None
+            if chat["message_count"] == 1 and sender == "You":
                 # Truncate long messages for the title
                 title = message[:30] + "..." if len(message) > 30 else message
                 chat["title"] = title
                 
-            self.save_chats()
+            # One appended row, not a rewrite of every chat
+            self.store.add_message(chat_id, sender, message, timestamp, title=title)
     
     def update_chat_title(self, chat_id: str, new_title: str):
         """Update the title of a chat"""
-        chat = self.get_chat(chat_id)
-        if chat:
-            chat["title"] = new_title
-            self.save_chats()
+        with self.lock:
+            chat = self.chats.get(chat_id)
+            if chat:
+                chat["title"] = new_title
+                self.store.update_title(chat_id, new_title)
     
     def delete_chat(self, chat_id: str):
         """Delete a chat by ID"""
-        self.chats["chats"] = [chat for chat in self.get_chat_list() if chat["id"] != chat_id]
-        self.save_chats()
+        with self.lock:
+            if self.chats.pop(chat_id, None) is not None:
+                self.order.remove(chat_id)
+            self.store.delete_chat(chat_id)
 
 def chatbot_page(page: Page) -> Container:
     # Enhanced blue color scheme
@@ -103,9 +157,9 @@ def chatbot_page(page: Page) -> Container:
     chat_user_bubble = "#E3F2FD"  # Very light blue for user bubbles
     chat_ai_bubble = "#F8F9FA"    # Off-white for AI bubbles
     
-    # Initialize chat manager and model
+    # Initialize chat manager; the Gemini SDK loads in the background meanwhile
     chat_manager = ChatManager()
-    model = genai.GenerativeModel('gemini-1.5-flash')
+    assistant.preload()
     
     # Current chat session data
     current_chat = {
@@ -113,19 +167,31 @@ def chatbot_page(page: Page) -> Container:
         "session": None
     }
     
-    # Chat history display
-    chat_history = Column(
+    # (timestamp, id) of the oldest message shown, or None once the whole chat is shown
+    history_state = {"before": None, "loading": False}
+
+    def on_history_scroll(e):
+        if e.pixels <= CHAT_SCROLL_THRESHOLD and history_state["before"] and not history_state["loading"]:
+            load_older_messages()
+
+    # Chat history display; ListView only lays out the bubbles that are on screen
+    chat_history = ListView(
         spacing=10,
-        scroll=ScrollMode.AUTO,
         expand=True,
         width=page.window.width * 0.70,
-        height=page.window.height * 0.44
+        height=page.window.height * 0.44,
+        on_scroll=on_history_scroll,
     )
     
-    # Add messages to chat UI
-    def add_message(sender_name, message_text, save_to_history=True):
+    # Build one message bubble
+    def message_row(sender_name, message_text, key=None):
         bubble_color = chat_user_bubble if sender_name == "You" else chat_ai_bubble
         alignment_right = True if sender_name == "You" else False
+        body = Text(
+            message_text, 
+            size=14, 
+            selectable=True
+        ) if sender_name == "You" else Markdown( message_text, selectable=True, extension_set=MarkdownExtensionSet.GITHUB_WEB)
             
         message_container = Container(
             content=Column([
@@ -136,11 +202,7 @@ def chatbot_page(page: Page) -> Container:
                     color=primary_color if sender_name != "You" else Colors.BLACK87,
                     text_align="right" if sender_name == "You" else "left"
                 ),
-                Text(
-                    message_text, 
-                    size=14, 
-                    selectable=True
-                ) if sender_name == "You" else Markdown( message_text, selectable=True, extension_set=MarkdownExtensionSet.GITHUB_WEB)
+                body,
             ]),
             padding=padding.all(12),
             bgcolor=bubble_color,
@@ -150,19 +212,65 @@ def chatbot_page(page: Page) -> Container:
             shadow={"blur": 2, "color": Colors.BLACK12, "offset": (0, 1)}
         )
         
-        row = Row(
+        # data holds the message body so a streamed reply can be updated in place
+        return Row(
             [message_container],
-            alignment="end" if alignment_right else "start"
+            alignment="end" if alignment_right else "start",
+            key=key,
+            data=body,
         )
-        
-        chat_history.controls.append(row)
+
+    def set_history_cursor(messages):
+        # A short page means the start of the chat has been reached
+        oldest = messages[0] if len(messages) == CHAT_PAGE_SIZE else None
+        history_state["before"] = (oldest["timestamp"], oldest["id"]) if oldest else None
+
+    # Show the latest page of a chat with one update; returns whether it has messages
+    def show_chat_history(chat_id):
+        messages = chat_manager.get_messages(chat_id)
+        chat_history.controls = [
+            message_row(msg["sender"], msg["message"], key=f"msg-{msg['id']}") for msg in messages
+        ]
+        set_history_cursor(messages)
+        page.update()
+        chat_history.scroll_to(offset=-1)
+        return bool(messages)
+
+    def load_older_messages():
+        chat_id = current_chat["id"]
+        history_state["loading"] = True
+        try:
+            messages = chat_manager.get_messages(chat_id, before=history_state["before"])
+            # The user may have switched chats meanwhile
+            if chat_id != current_chat["id"] or not messages:
+                return
+            anchor = chat_history.controls[0].key if chat_history.controls else None
+            chat_history.controls[0:0] = [
+                message_row(msg["sender"], msg["message"], key=f"msg-{msg['id']}") for msg in messages
+            ]
+            set_history_cursor(messages)
+            chat_history.update()
+            # Keep the message that was on top in view instead of jumping to the oldest
+            if anchor:
+                chat_history.scroll_to(key=anchor)
+        finally:
+            history_state["loading"] = False
+    
+    # Add a new message to the chat UI
+    def add_message(sender_name, message_text, save_to_history=True):
+        chat_history.controls.append(message_row(sender_name, message_text))
         page.update()
         # Scroll to bottom
-        chat_history.scroll_to(offset=chat_history.height)
+        chat_history.scroll_to(offset=-1)
         
         # Save to chat history if needed
-        if save_to_history and current_chat["id"]:
-            chat_manager.add_message(current_chat["id"], sender_name, message_text)
+        if save_to_history:
+            save_message(current_chat["id"], sender_name, message_text)
+
+    def save_message(chat_id, sender_name, message_text):
+        if chat_id:
+            chat_manager.add_message(chat_id, sender_name, message_text)
+            move_chat_option_to_top(chat_id)
     
     # Thinking indicator
     thinking_indicator = ProgressRing(
@@ -181,8 +289,8 @@ def chatbot_page(page: Page) -> Container:
         # Create a new chat if none exists
         if not current_chat["id"]:
             current_chat["id"] = chat_manager.create_new_chat()
-            current_chat["session"] = model.start_chat(history=[])
-            update_chat_dropdown()
+            current_chat["session"] = assistant.start_chat()
+            move_chat_option_to_top(current_chat["id"])
             chat_dropdown.value = current_chat["id"]
             
         add_message("You", user_text)
@@ -196,112 +304,51 @@ def chatbot_page(page: Page) -> Container:
 
         # Use standard Python threading for background processing
         def process_response():
-            try:
-                prompt = f"""
-# Medical Check-up Assistant Prompt
-
-You are a Medical Check-up Assistant AI designed to support nurses and doctors during routine patient examinations and simple check-ups. Your role is to provide helpful information, reminders, and assistance with basic medical protocols to make routine appointments more efficient and thorough.
-
-## Primary Functions
-
-- **Vital Signs Guidance**: Provide normal ranges and interpretation assistance for temperature, blood pressure, pulse, respiratory rate, and oxygen saturation.
-
-- **Checklist Support**: Help track completion of routine check-up steps to ensure nothing is overlooked.
-
-- **Documentation Assistance**: Offer templates and suggestions for routine medical notes and patient instructions.
-
-- **Patient Information**: Help retrieve and organize basic patient information during consultations.
-
-- **Routine Questions**: Suggest standard screening questions appropriate for different patient demographics.
-
-## How to Respond
-
-When assisting medical staff during check-ups:
-
-1. **Be Concise**: Provide brief, clear responses that don't interrupt workflow.
-
-2. **Be Practical**: Focus on immediately useful information for routine visits.
-
-3. **Be Supportive**: Offer reminders and suggestions without being prescriptive.
-
-4. **Be Organized**: Present information in a structured, easy-to-scan format.
-
-5. **Be Respectful**: Recognize the medical staff's expertise and position as the primary care provider.
-
-## Example Scenarios
-
-### Scenario 1: Vital Sign Check
-**Staff**: "What's the normal blood pressure range for a 65-year-old patient?"
-
-**Assistant**: "Normal BP for 65-year-old adults: 
-- Ideal: Below 120/80 mmHg
-- Normal: Up to 129/84 mmHg
-- Elevated: 130-139/85-89 mmHg
-- High: 140/90 mmHg or higher
-
-Would you like age-specific considerations for this patient?"
-
-### Scenario 2: Routine Check-up Reminders
-**Staff**: "Help me with a standard adult check-up checklist."
-
-**Assistant**: "Standard Adult Check-up Checklist:
-- Vital signs (BP, pulse, temp, respiration)
-- Height and weight (calculate BMI)
-- Medical history review/updates
-- Medication review
-- Basic physical examination
-- Preventive screening questions
-- Age-appropriate screenings due
-- Immunization review
-- Lifestyle discussion (diet, exercise, sleep)
-- Any specific patient concerns
-
-Need any specific details for any of these items?"
-
-### Scenario 3: Simple Documentation
-**Staff**: "I need a template for normal findings in a routine physical."
-
-**Assistant**: "Basic Normal Findings Template:
-- General: Alert, oriented, no acute distress
-- Vital signs: Within normal limits
-- HEENT: Normocephalic, PERRLA, TMs intact, oropharynx clear
-- Neck: Supple, no lymphadenopathy, thyroid normal
-- Chest: Clear to auscultation bilaterally
-- Heart: RRR, no murmurs/gallops/rubs
-- Abdomen: Soft, non-tender, no organomegaly
-- Extremities: No edema, pulses intact
-- Skin: No rashes or lesions
-- Neuro: CN II-XII intact, normal gait
-
-Would you like me to expand any section?"
-
-## Limitations to Acknowledge
-
-- I do not diagnose conditions or interpret test results
-- I do not prescribe or recommend specific treatments
-- I cannot access patient records unless specifically shared
-- I am meant to assist with routine matters, not complex or emergency situations
-- I defer to the medical professional's judgment at all times
+            # The user may switch chats while the reply streams in; it still belongs to this one
+            chat_id = current_chat["id"]
+            session = current_chat["session"]
+            row = None
+            parts = []
+            last_render = 0
 
-I'm here to make routine check-ups more efficient by providing quick reference information and organizational support. How can I assist with today's patient appointments?
+            def showing():
+                return current_chat["id"] == chat_id
 
-prompt: {user_text}
-"""
-                # Send message to Gemini chat session
-                response = current_chat["session"].send_message(prompt)
-                response_text = response.text
+            try:
+                # The system instruction is configured on the model, so only the user's text is sent
+                for chunk in assistant.stream_message(session, user_text):
+                    parts.append(chunk)
+                    if not showing():
+                        continue
+                    if row is None:
+                        # First token: replace the thinking indicator with a live bubble
+                        row = message_row("Gemini", "")
+                        chat_history.controls.append(row)
+                        thinking_indicator.visible = False
+                    # Re-render the Markdown at most every STREAM_RENDER_SECONDS
+                    if time.monotonic() - last_render >= STREAM_RENDER_SECONDS:
+                        row.data.value = "".join(parts)
+                        page.update()
+                        chat_history.scroll_to(offset=-1)
+                        last_render = time.monotonic()
+                response_text = "".join(parts)
             except Exception as e:
-                response_text = f"Sorry, I encountered an error: {str(e)}"
-            
-            # Update UI on the main thread
-            def update_ui():
-                add_message("Gemini", response_text)
-                message_input.disabled = False
-                send_button.disabled = False
-                thinking_indicator.visible = False
-                page.update()
+                error_text = f"Sorry, I encountered an error: {str(e)}"
+                response_text = f"{''.join(parts)}\n\n{error_text}" if parts else error_text
             
-            update_ui()
+            # Show the complete reply if its chat is still open, and save it once either way
+            if showing():
+                if row is None or row not in chat_history.controls:
+                    add_message("Gemini", response_text, save_to_history=False)
+                else:
+                    row.data.value = response_text
+            save_message(chat_id, "Gemini", response_text)
+            message_input.disabled = False
+            send_button.disabled = False
+            thinking_indicator.visible = False
+            page.update()
+            if showing():
+                chat_history.scroll_to(offset=-1)
         
         # Start a thread for background processing
         threading.Thread(target=process_response).start()
@@ -310,13 +357,14 @@ prompt: {user_text}
     def create_new_chat(e):
         # Reset the UI
         chat_history.controls.clear()
+        history_state["before"] = None
         
         # Create a new chat session
         current_chat["id"] = chat_manager.create_new_chat()
-        current_chat["session"] = model.start_chat(history=[])
+        current_chat["session"] = assistant.start_chat()
         
         # Update dropdown and select the new chat
-        update_chat_dropdown()
+        move_chat_option_to_top(current_chat["id"])
         chat_dropdown.value = current_chat["id"]
         
         # Add welcome message
@@ -337,14 +385,10 @@ prompt: {user_text}
         if chat_data:
             # Create a new chat session
             current_chat["id"] = selected_chat_id
-            current_chat["session"] = model.start_chat(history=[])
+            current_chat["session"] = assistant.start_chat()
             
-            # Display messages
-            for msg in chat_data["messages"]:
-                add_message(msg["sender"], msg["message"], save_to_history=False)
-            
-            # If empty chat, add welcome message
-            if not chat_data["messages"]:
+            # Display the latest messages; older ones load on scroll-up
+            if not show_chat_history(selected_chat_id):
                 add_welcome_message()
         
         page.update()
@@ -353,26 +397,33 @@ prompt: {user_text}
     def delete_current_chat(e):
         if current_chat["id"]:
             chat_manager.delete_chat(current_chat["id"])
+            remove_chat_option(current_chat["id"])
             current_chat["id"] = None
             current_chat["session"] = None
             
             # Clear the UI
             chat_history.controls.clear()
+            history_state["before"] = None
+            page.update()
             
-            # Update the dropdown
-            update_chat_dropdown()
-            
-            # Create a new chat
-            if len(chat_manager.chats) == 0:
+            # Create a new chat once the last one is gone
+            if not chat_manager.chats:
                 create_new_chat(None)
     
+    # Dropdown option per chat id, reused as chats move around
+    chat_options = {}
+
+    def chat_option(chat):
+        option = chat_options.get(chat["id"])
+        if option is None:
+            option = chat_options[chat["id"]] = dropdown.Option(key=chat["id"], text=chat["title"])
+        option.text = chat["title"]
+        return option
+
     # Update chat dropdown options
     def update_chat_dropdown():
-        chat_list = chat_manager.get_chat_list()
-        chat_dropdown.options = [
-            dropdown.Option(key=chat["id"], text=chat["title"]) 
-            for chat in sorted(chat_list, key=lambda x: x["updated_at"], reverse=True)
-        ]
+        # ChatManager already keeps chats most recently updated first
+        chat_dropdown.options = [chat_option(chat) for chat in chat_manager.get_chat_list()]
         
         # Add a default option if no chats exist
         if not chat_dropdown.options:
@@ -380,6 +431,25 @@ prompt: {user_text}
 
         page.update()
 
+    def move_chat_option_to_top(chat_id):
+        # A chat that was just created or updated is the most recent one, so the
+        # dropdown stays sorted by moving only its option
+        chat = chat_manager.get_chat(chat_id)
+        if chat is None:
+            return
+        option = chat_option(chat)
+        options = [o for o in chat_dropdown.options if o is not option and o.key != "new"]
+        chat_dropdown.options = [option] + options
+        if chat_dropdown.page:
+            chat_dropdown.update()
+
+    def remove_chat_option(chat_id):
+        option = chat_options.pop(chat_id, None)
+        chat_dropdown.options = [o for o in chat_dropdown.options if o is not option]
+        if not chat_dropdown.options:
+            chat_dropdown.options = [dropdown.Option(key="new", text="New Chat")]
+        chat_dropdown.value = None
+
     # Message input field
     message_input = TextField(
         hint_text="Type a message...",
@@ -431,14 +501,6 @@ prompt: {user_text}
     def add_welcome_message():
         welcome_message = "Hello! I'm your Gemini-powered assistant. How can I help you today?"
         add_message("Gemini", welcome_message)
-        
-        # Initialize chat session with a system message
-        try:
-            if current_chat["session"]:
-                current_chat["session"].send_message("You are a helpful AI assistant. Respond concisely and accurately.")
-        except Exception:
-            # Silently handle any initialization errors
-            pass
     
     # Initialize the UI when the page is mounted
     def init_ui(e):
@@ -450,22 +512,14 @@ prompt: {user_text}
             create_new_chat(None)
         else:
             # Load the most recent chat
-            most_recent = sorted(
-                chat_manager.get_chat_list(), 
-                key=lambda x: x["updated_at"], 
-                reverse=True
-            )[0]
+            most_recent = chat_manager.get_chat_list()[0]
             
             current_chat["id"] = most_recent["id"]
-            current_chat["session"] = model.start_chat(history=[])
+            current_chat["session"] = assistant.start_chat()
             chat_dropdown.value = current_chat["id"]
             
-            # Load the messages
-            for msg in most_recent["messages"]:
-                add_message(msg["sender"], msg["message"], save_to_history=False)
-            
-            # If empty chat, add welcome message
-            if not most_recent["messages"]:
+            # Load the latest messages; older ones load on scroll-up
+            if not show_chat_history(most_recent["id"]):
                 add_welcome_message()
     
     # Set the initialization function
@@ -542,19 +596,19 @@ def create_dashboard(chart_data, user_info=None, page: Page = None, db:HospitalD
         user_info = {"name": "Smith", "role": "Doctor"}
 
     def appointments_form(e):
-        page.overlay.append(create_form(form_type="appointment", page=page))
+        page.overlay.append(create_form(form_type="appointment", page=page, db=db))
         page.update()
     
     def prescription_form(e):
-        page.overlay.append(create_form(form_type="prescription", page=page))
+        page.overlay.append(create_form(form_type="prescription", page=page, db=db))
         page.update()
 
     def billing_form(e):
-        page.overlay.append(create_form(form_type="billing", page=page))
+        page.overlay.append(create_form(form_type="billing", page=page, db=db))
         page.update()
 
     def medical_record_form(e):
-        page.overlay.append(create_form(form_type="medical_record", page=page))
+        page.overlay.append(create_form(form_type="medical_record", page=page, db=db))
         page.update()
 
     # Create header section
@@ -624,6 +678,14 @@ def create_dashboard(chart_data, user_info=None, page: Page = None, db:HospitalD
         ),
     )
     
+    # Metric texts remember their template so refresh() can re-render and diff them
+    metric_texts = []
+
+    def metric_text(template, **style):
+        text = Text(template.format_map(DashboardValues(chart_data)), **style)
+        metric_texts.append((text, template))
+        return text
+
     # Create metrics cards
     metrics = Row(
         controls=[
@@ -634,8 +696,8 @@ def create_dashboard(chart_data, user_info=None, page: Page = None, db:HospitalD
                         Column(
                             controls=[
                                 Text("Total Patients", size=16, color=Colors.GREY_600),
-                                Text(f"{chart_data.get("total_patients")}", size=24, color=Colors.BLACK87, weight="bold"),
-                                Text(f"+{chart_data.get("new_patients")} new today", size=14, color=Colors.GREEN_500),
+                                metric_text("{total_patients}", size=24, color=Colors.BLACK87, weight="bold"),
+                                metric_text("+{new_patients} new today", size=14, color=Colors.GREEN_500),
                             ],
                             spacing=5,
                             expand=True,
@@ -676,8 +738,8 @@ def create_dashboard(chart_data, user_info=None, page: Page = None, db:HospitalD
                         Column(
                             controls=[
                                 Text("Appointments", size=16, color=Colors.GREY_600),
-                                Text(f"{chart_data.get("total_appointments","")}", size=24, color=Colors.BLACK87, weight="bold"),
-                                Text(f"+{chart_data.get("new_appointments","")} scheduled today", size=14, color=Colors.GREEN_500),
+                                metric_text("{total_appointments}", size=24, color=Colors.BLACK87, weight="bold"),
+                                metric_text("+{new_appointments} scheduled today", size=14, color=Colors.GREEN_500),
                             ],
                             spacing=5,
                             expand=True,
@@ -718,8 +780,8 @@ def create_dashboard(chart_data, user_info=None, page: Page = None, db:HospitalD
                         Column(
                             controls=[
                                 Text("Operations", size=16, color=Colors.GREY_600),
-                                Text(f"{chart_data.get("total_operations","")}", size=24, color=Colors.BLACK87, weight="bold"),
-                                Text(f"+{chart_data.get("new_operations","")} this week", size=14, color=Colors.GREEN_500),
+                                metric_text("{total_operations}", size=24, color=Colors.BLACK87, weight="bold"),
+                                metric_text("+{new_operations} this week", size=14, color=Colors.GREEN_500),
                             ],
                             spacing=5,
                             expand=True,
@@ -760,7 +822,7 @@ def create_dashboard(chart_data, user_info=None, page: Page = None, db:HospitalD
                         Column(
                             controls=[
                                 Text("Avg Wait Time", size=16, color=Colors.GREY_600),
-                                Text(f"{chart_data.get("avg_wait_time","")}", size=24, color=Colors.BLACK87, weight="bold"),
+                                metric_text("{avg_wait_time}", size=24, color=Colors.BLACK87, weight="bold"),
                                 Text("-2 min from last week", size=14, color=Colors.GREEN_500),
                             ],
                             spacing=5,
@@ -798,27 +860,42 @@ def create_dashboard(chart_data, user_info=None, page: Page = None, db:HospitalD
         spacing=15,
     )
     
-    department_chart_data = db.get_department_performance()
-    department_chart_metrics = db.get_department_performance_metrics()
+    # The chart panels start as skeletons so the dashboard paints right away; each
+    # panel's query runs on its own worker thread and the panel is swapped in when done
+    panel_data = {}
 
-    print(department_chart_data, department_chart_metrics)
+    # Panels still loading, for the startup profile
+    loading_panels = {"department_performance", "recent_activity", "today_appointments"}
 
-    # Department Performance Chart
-    department_chart = create_department_chart(chart_data.get("department_performance", department_chart_data))
-    
-    recent_Activity_data = db.get_recent_activity(3)
+    def load_panel(slot, key, query, build):
+        def work():
+            try:
+                data = chart_data[key] if key in chart_data else query()
+                content = build(data)
+                panel_data[key] = data
+            except Exception as e:
+                print(f"Error loading dashboard panel {key}: {e}")
+                content = panel_error(slot.content)
+            slot.content = content
+            # Until the dashboard is mounted, the new content simply goes out with it
+            if slot.page:
+                slot.update()
+            loading_panels.discard(key)
+            if not loading_panels:
+                startup_profiler.mark("dashboard panels loaded", final=True)
+        DASHBOARD_EXECUTOR.submit(work)
 
-    print(recent_Activity_data)
+    # Department Performance Chart
+    department_chart = Container(content=panel_skeleton("Department Performance"), expand=True)
+    load_panel(department_chart, "department_performance", db.get_department_performance, create_department_chart)
 
     # Recent Activity Timeline
-    activity_timeline = create_activity_timeline(chart_data.get("recent_activity", recent_Activity_data))
-    
-    appointments_list_data = db.get_todays_top_appointments()
-
-    print(appointments_list_data)
+    activity_timeline = Container(content=panel_skeleton("Recent Activity"), expand=True)
+    load_panel(activity_timeline, "recent_activity", lambda: db.get_recent_activity(3), create_activity_timeline)
 
     # Today's Appointments List
-    appointments_list = create_appointments_list(chart_data.get("today_appointments", appointments_list_data))
+    appointments_list = Container(content=panel_skeleton("Today's Appointments"), expand=True)
+    load_panel(appointments_list, "today_appointments", db.get_todays_top_appointments, create_appointments_list)
     
     # Layout the charts in a responsive grid
     charts_grid = Container(
@@ -852,6 +929,53 @@ def create_dashboard(chart_data, user_info=None, page: Page = None, db:HospitalD
         expand=True,
     )
     
+    refresh_lock = threading.Lock()
+
+    def refresh(changes=None):
+        """Recompute every dashboard value and push only the controls whose value changed"""
+        with refresh_lock:
+            changed = []
+            values = DashboardValues(db.get_dashboard_stats())
+            for text, template in metric_texts:
+                value = template.format_map(values)
+                if text.value != value:
+                    text.value = value
+                    changed.append(text)
+
+            # Department bars are patched in place while the department list is unchanged
+            departments = db.get_department_performance()
+            rows = getattr(department_chart.content, "data", None) or {}
+            if departments and [dept.get("department", "Unknown") for dept in departments] == list(rows):
+                for dept in departments:
+                    percent_text, bar = rows[dept.get("department", "Unknown")]
+                    efficiency = dept.get("efficiency", 0)
+                    if percent_text.value != f"{efficiency}%":
+                        percent_text.value = f"{efficiency}%"
+                        bar.value = efficiency / 100
+                        changed.extend([percent_text, bar])
+            elif departments != panel_data.get("department_performance"):
+                department_chart.content = create_department_chart(departments)
+                changed.append(department_chart)
+            panel_data["department_performance"] = departments
+
+            # List panels are only rebuilt when their rows differ
+            for slot, key, query, build in (
+                (activity_timeline, "recent_activity", lambda: db.get_recent_activity(3), create_activity_timeline),
+                (appointments_list, "today_appointments", db.get_todays_top_appointments, create_appointments_list),
+            ):
+                try:
+                    data = query()
+                    if data != panel_data.get(key):
+                        slot.content = build(data)
+                        panel_data[key] = data
+                        changed.append(slot)
+                except Exception as e:
+                    print(f"Error refreshing dashboard panel {key}: {e}")
+
+            for control in changed:
+                if control.page:
+                    control.update()
+
     # Combine all sections into the main dashboard
     dashboard = Container(
         content=Column(
@@ -867,10 +991,40 @@ def create_dashboard(chart_data, user_info=None, page: Page = None, db:HospitalD
         padding=padding.all(20),
         bgcolor=Colors.GREY_100,
         expand=True,
+        data={"refresh": refresh},
     )
     
     return dashboard
 
+def panel_skeleton(title, rows=4):
+    """Placeholder shown in a dashboard panel while its data loads"""
+    return Container(
+        content=Column(
+            controls=[
+                Text(title, size=18, color=Colors.BLACK87, weight="bold"),
+                Container(height=10),  # Spacer
+            ] + [
+                Container(height=14, width=width, bgcolor=Colors.GREY_200, border_radius=4)
+                for width in (260, 200, 240, 180)[:rows]
+            ],
+            spacing=10,
+        ),
+        padding=padding.all(20),
+        border_radius=BorderRadius(
+            top_left=10,
+            bottom_left=10,
+            top_right=10,
+            bottom_right=10,
+        ),
+        bgcolor=Colors.WHITE,
+        expand=True,
+    )
+
+def panel_error(skeleton):
+    """Replace a panel skeleton's placeholder bars with an error message"""
+    skeleton.content.controls[2:] = [Text("Could not load this panel", size=14, color=Colors.RED_400)]
+    return skeleton
+
 def create_department_chart(data):
     """Create department performance chart component"""
     # If no data, create sample data
@@ -885,29 +1039,32 @@ def create_department_chart(data):
     
     # Create progress bars for each department
     department_rows = []
+    # Department name -> (percentage Text, ProgressBar), for in-place refreshes
+    department_controls = {}
     
     for dept in data:
         dept_name = dept.get("department", "Unknown")
         efficiency = dept.get("efficiency", 0)
+        percent_text = Text(f"{efficiency}%", size=14, color=Colors.BLUE_700)
+        bar = ProgressBar(
+            value=efficiency/100,
+            bgcolor=Colors.BLUE_100,
+            color=Colors.BLUE_700,
+            height=10,
+        )
+        department_controls[dept_name] = (percent_text, bar)
         
         department_rows.append(
             Row(
                 controls=[
                     Text(dept_name, size=14, color=Colors.BLACK87, expand=True),
-                    Text(f"{efficiency}%", size=14, color=Colors.BLUE_700),
+                    percent_text,
                 ],
                 alignment="spaceBetween",
             )
         )
         
-        department_rows.append(
-            ProgressBar(
-                value=efficiency/100,
-                bgcolor=Colors.BLUE_100,
-                color=Colors.BLUE_700,
-                height=10,
-            )
-        )
+        department_rows.append(bar)
     
     # Add a "View Details" link at the bottom
     department_rows.append(
@@ -951,6 +1108,7 @@ def create_department_chart(data):
         ),
         bgcolor=Colors.WHITE,
         expand=True,
+        data=department_controls,
     )
 
 def create_activity_timeline(data):
@@ -1273,7 +1431,66 @@ def create_appointments_list(data):
         expand=True,
     )
 
-def create_form(form_type, page:Page):
+def search_picker(label, search, on_select, describe=None, width=500):
+    """
+    Search-as-you-type picker: a text field whose debounced queries are answered
+    off the UI thread with the top matches, shown as a short list to pick from.
+
+    Args:
+        label: Field label
+        search: Function query -> list of row dicts with "id" and "name"
+        on_select: Called with the picked row, or None when the text is edited again
+        describe: Optional function row -> subtitle text
+        width: Field width
+
+    Returns:
+        Column holding the field and its results
+    """
+    results = Column(spacing=0, width=width)
+
+    def show_results(query):
+        matches = search(query) if query.strip() else []
+        # A newer query may have been typed while this one was running
+        if field.value != query:
+            return
+        results.controls = [
+            ListTile(
+                title=Text(row["name"], size=14),
+                subtitle=Text(describe(row), size=12, color=Colors.GREY_600) if describe else None,
+                dense=True,
+                on_click=lambda _, row=row: select(row),
+            )
+            for row in matches
+        ]
+        if query.strip() and not matches:
+            results.controls = [Text("No matches", size=14, color=Colors.GREY_600)]
+        if results.page:
+            results.update()
+
+    debouncer = Debouncer(SEARCH_DEBOUNCE_SECONDS, show_results, SEARCH_EXECUTOR)
+
+    def on_change(e):
+        on_select(None)
+        debouncer(field.value or "")
+
+    def select(row):
+        debouncer.cancel()
+        field.value = row["name"]
+        results.controls = []
+        on_select(row)
+        picker.update()
+
+    field = TextField(
+        label=label,
+        hint_text="Type to search",
+        prefix_icon=Icons.SEARCH,
+        on_change=on_change,
+        width=width,
+    )
+    picker = Column(controls=[field, results], spacing=0)
+    return picker
+
+def create_form(form_type, page:Page, db: HospitalDB):
     """
     Universal form creation method for all form types - now creates a modal overlay
     
@@ -1281,18 +1498,36 @@ def create_form(form_type, page:Page):
         form_type: String indicating which form to create ("appointment", "prescription", "billing", "medical_record")
         page_state: State management for showing/hiding forms
         page: Page object for updating the UI
+        db: The app's shared database, used for the pickers and for saving
         
     Returns:
         Container with the appropriate form content as a modal overlay
     """
-    # Initialize database connection
-    db = HospitalDB()
-    
-    # Get common data needed for most forms
-    patients = db.get_all_patients()
-    doctors = db.get_all_users(role="doctor")
-    patient_options = [dropdown.Option(key=str(p["id"]), text=p["name"]) for p in patients]
-    doctor_options = [dropdown.Option(key=str(d["id"]), text=d["name"]) for d in doctors]
+    # Patients and doctors are picked by type-ahead search instead of loading every row
+    def patient_picker(on_select):
+        return search_picker(
+            "Select Patient",
+            db.find_patients,
+            on_select,
+            describe=lambda p: " · ".join(filter(None, [p.get("phone"), p.get("email")])),
+        )
+
+    def doctor_picker(on_select):
+        return search_picker(
+            "Select Doctor",
+            lambda query: db.find_staff(query, roles=(Role.DOCTOR,)),
+            on_select,
+            describe=lambda d: d.get("specialization") or "",
+        )
+
+    def select_patient(patient):
+        form_data.update({"patient_id": str(patient["id"]) if patient else None})
+
+    def select_doctor(doctor):
+        form_data.update({"doctor_id": str(doctor["id"]) if doctor else None})
+
+    # Build the patient index in the background so the first keystroke doesn't wait on it
+    DASHBOARD_EXECUTOR.submit(db.search_index, "patients")
     
     # Form configuration based on type
     form_config = {
@@ -1300,6 +1535,7 @@ def create_form(form_type, page:Page):
             "title": "Schedule New Appointment",
             "submit_text": "Schedule Appointment",
             "save_function": save_appointment,
+            "success_text": "Appointment saved successfully!",
             "state_key": "show_appointment_form",
             "form_data": {
                 "patient_id": None,
@@ -1313,6 +1549,7 @@ def create_form(form_type, page:Page):
             "title": "Add New Prescription",
             "submit_text": "Save Prescription",
             "save_function": save_prescription,
+            "success_text": "Prescription saved successfully!",
             "state_key": "show_prescription_form",
             "form_data": {
                 "record_id": None,
@@ -1327,6 +1564,7 @@ def create_form(form_type, page:Page):
             "title": "Create New Bill",
             "submit_text": "Create Bill",
             "save_function": save_bill,
+            "success_text": "Billing saved successfully!",
             "state_key": "show_billing_form",
             "form_data": {
                 "patient_id": None,
@@ -1338,6 +1576,7 @@ def create_form(form_type, page:Page):
             "title": "Add New Medical Record",
             "submit_text": "Save Medical Record",
             "save_function": save_medical_record,
+            "success_text": "Medical Record saved successfully!",
             "state_key": "show_medical_record_form",
             "form_data": {
                 "patient_id": None,
@@ -1353,11 +1592,34 @@ def create_form(form_type, page:Page):
     config = form_config[form_type]
     form_data = config["form_data"]
     
+    toasts = ToastManager.for_page(page)
+
     # Function to close form and update page
     def close_form(_):
-        # Remove the overlay
-        page.overlay.clear()
+        # Remove only this form's overlay; toasts and other overlays stay
+        if form_overlay in page.overlay:
+            page.overlay.remove(form_overlay)
+        page.update()
+
+    def submit(_):
+        # Saving runs on a worker thread; the button is disabled until it finishes
+        submit_button.disabled = True
         page.update()
+
+        def work():
+            error = "Could not save. Please check the required fields."
+            try:
+                saved = config["save_function"](db, form_data)
+            except AppointmentConflict as e:
+                saved, error = None, str(e)
+            if saved:
+                close_form(None)
+                toasts.show(config["success_text"])
+            else:
+                submit_button.disabled = False
+                toasts.show(error, kind="error")
+
+        SAVE_EXECUTOR.submit(work)
     
     # Create form fields based on form_type
     form_fields = []
@@ -1378,44 +1640,99 @@ def create_form(form_type, page:Page):
     
     # Create form-specific fields
     if form_type == "appointment":
+        def select_appointment_doctor(doctor):
+            select_doctor(doctor)
+            if doctor:
+                show_free_slots(doctor_picker_field)
+
+        doctor_picker_column = doctor_picker(select_appointment_doctor)
+        doctor_picker_field = doctor_picker_column.controls[0]
+        department_dropdown = Dropdown(
+            label="Or find a free slot by department",
+            options=[dropdown.Option(specialization) for specialization in db.get_specializations()],
+            on_change=lambda e: show_free_slots(e.control),
+            width=500,
+        )
+        selected_slot_text = Text("No date/time selected", size=14, color=Colors.GREY_600)
+        free_slots_row = Row(wrap=True, spacing=8, run_spacing=8, width=500)
+
+        def update_selected_slot():
+            selected_slot_text.value = f"Selected: {form_data['appointment_date'] or '--'} at {form_data['appointment_time'] or '--'}"
+            page.update()
+
+        def pick_slot(slot):
+            form_data.update({
+                "doctor_id": str(slot["doctor_id"]),
+                "appointment_date": slot["date"],
+                "appointment_time": slot["time"],
+            })
+            doctor_picker_field.value = slot["doctor_name"]
+            update_selected_slot()
+
+        def show_free_slots(source):
+            # Search the selected department if one was picked last, otherwise the selected doctor
+            if source is department_dropdown and department_dropdown.value:
+                slots = db.find_free_slots(specialization=department_dropdown.value, limit=12)
+                show_doctor = True
+            elif form_data["doctor_id"]:
+                slots = db.find_free_slots(doctor_id=int(form_data["doctor_id"]), limit=12)
+                show_doctor = False
+            else:
+                return
+
+            free_slots_row.controls = [
+                OutlinedButton(
+                    text=f"{slot['date']} {slot['time']}" + (f" · {slot['doctor_name']}" if show_doctor else ""),
+                    on_click=lambda _, slot=slot: pick_slot(slot),
+                )
+                for slot in slots
+            ] or [Text("No free slots in the next two weeks", size=14, color=Colors.GREY_600)]
+            page.update()
+
+        def set_date(e):
+            form_data.update({"appointment_date": e.control.value.strftime("%Y-%m-%d")})
+            update_selected_slot()
+
+        def set_time(e):
+            form_data.update({"appointment_time": e.control.value.strftime("%H:%M")})
+            update_selected_slot()
+
         form_fields.extend([
-            Dropdown(
-                label="Select Patient",
-                options=patient_options,
-                on_change=lambda e: form_data.update({"patient_id": e.control.value}),
-                width=500,
-            ),
-            Dropdown(
-                label="Select Doctor",
-                options=doctor_options,
-                on_change=lambda e: form_data.update({"doctor_id": e.control.value}),
-                width=500,
-            ),
-            ElevatedButton(
-                "Pick date",
-                icon=Icons.CALENDAR_MONTH,
-                on_click=lambda e: page.open(
-                    DatePicker(
-                        first_date=datetime(year=2024, month=3, day=10),
-                        last_date=datetime(year=2040, month=12, day=31),
-                        date_picker_mode=DatePickerMode.DAY,
-                        on_change=lambda e: form_data.update({"appointment_date": e.control.value.strftime("%Y-%m-%d")}),
+            patient_picker(select_patient),
+            doctor_picker_column,
+            department_dropdown,
+            Text("Next free slots", size=14, weight="bold"),
+            free_slots_row,
+            Row(
+                controls=[
+                    ElevatedButton(
+                        "Pick date",
+                        icon=Icons.CALENDAR_MONTH,
+                        on_click=lambda e: page.open(
+                            DatePicker(
+                                first_date=datetime(year=2024, month=3, day=10),
+                                last_date=datetime(year=2040, month=12, day=31),
+                                date_picker_mode=DatePickerMode.DAY,
+                                on_change=set_date,
+                            ),
+                        ),
                     ),
-                ),
+                    ElevatedButton(
+                        "Pick time",
+                        icon=Icons.TIME_TO_LEAVE,
+                        on_click=lambda _: page.open(
+                            TimePicker(
+                                confirm_text="Confirm",
+                                error_invalid_text="Time out of range",
+                                help_text="Pick your time slot",                
+                                on_change=set_time,
+                            )
+                        ),
+                    ),
+                ],
+                spacing=10,
             ),
-            ElevatedButton(
-                "Pick time",
-                icon=Icons.TIME_TO_LEAVE,
-                on_click=lambda _: page.open(
-                    TimePicker(
-                        confirm_text="Confirm",
-                        error_invalid_text="Time out of range",
-                        help_text="Pick your time slot",                
-                        on_change=lambda e: form_data.update({"appointment_time": e.control.value.strftime("%H:%M")}),
-                    )
-                ),
-            )
-            ,
+            selected_slot_text,
             TextField(
                 label="Reason",
                 multiline=True,
@@ -1436,10 +1753,9 @@ def create_form(form_type, page:Page):
         )
         
         # Function to update records when patient is selected
-        def update_records(e):
-            patient_id = e.control.value
-            if patient_id:
-                records = db.get_patient_records(int(patient_id))
+        def update_records(patient):
+            if patient:
+                records = db.get_patient_records(patient["id"])
                 record_options = [
                     dropdown.Option(
                         key=str(r["id"]), 
@@ -1452,12 +1768,7 @@ def create_form(form_type, page:Page):
                 page.update()
         
         form_fields.extend([
-            Dropdown(
-                label="Select Patient",
-                options=patient_options,
-                on_change=update_records,
-                width=500,
-            ),
+            patient_picker(update_records),
             records_dropdown,
             TextField(
                 label="Medication",
@@ -1499,11 +1810,10 @@ def create_form(form_type, page:Page):
         )
         
         # Function to update records when patient is selected
-        def update_records(e):
-            patient_id = e.control.value
-            form_data.update({"patient_id": patient_id})
-            if patient_id:
-                records = db.get_patient_records(int(patient_id))
+        def update_records(patient):
+            select_patient(patient)
+            if patient:
+                records = db.get_patient_records(patient["id"])
                 record_options = [
                     dropdown.Option(
                         key=str(r["id"]), 
@@ -1516,12 +1826,7 @@ def create_form(form_type, page:Page):
                 page.update()
         
         form_fields.extend([
-            Dropdown(
-                label="Select Patient",
-                options=patient_options,
-                on_change=update_records,
-                width=500,
-            ),
+            patient_picker(update_records),
             records_dropdown,
             TextField(
                 label="Amount ($)",
@@ -1533,18 +1838,8 @@ def create_form(form_type, page:Page):
     
     elif form_type == "medical_record":
         form_fields.extend([
-            Dropdown(
-                label="Select Patient",
-                options=patient_options,
-                on_change=lambda e: form_data.update({"patient_id": e.control.value}),
-                width=500,
-            ),
-            Dropdown(
-                label="Select Doctor",
-                options=doctor_options,
-                on_change=lambda e: form_data.update({"doctor_id": e.control.value}),
-                width=500,
-            ),
+            patient_picker(select_patient),
+            doctor_picker(select_doctor),
             TextField(
                 label="Diagnosis",
                 on_change=lambda e: form_data.update({"diagnosis": e.control.value}),
@@ -1565,14 +1860,15 @@ def create_form(form_type, page:Page):
         ])
     
     # Add submit/cancel buttons for all forms
+    submit_button = ElevatedButton(
+        text=config["submit_text"],
+        on_click=submit,
+        style=ButtonStyle(color=Colors.WHITE, bgcolor=Colors.BLUE_700),
+    )
     form_fields.append(
         Row(
             controls=[
-                ElevatedButton(
-                    text=config["submit_text"],
-                    on_click=lambda _: config["save_function"](form_data, page),
-                    style=ButtonStyle(color=Colors.WHITE, bgcolor=Colors.BLUE_700),
-                ),
+                submit_button,
                 OutlinedButton(
                     text="Cancel",
                     on_click=close_form,
@@ -1613,10 +1909,13 @@ def create_form(form_type, page:Page):
     
     return form_overlay
 
-def save_appointment(form_data, page:Page):
-    """Save new appointment to database"""
+def save_appointment(db: HospitalDB, form_data):
+    """
+    Save new appointment to database; returns its id, or None if it was not saved.
+
+    Raises AppointmentConflict if the doctor is already booked for the slot.
+    """
     try:
-        db = HospitalDB()
         patient_id = int(form_data.get("patient_id"))
         doctor_id = int(form_data.get("doctor_id"))
         appointment_date = form_data.get("appointment_date")
@@ -1625,9 +1924,8 @@ def save_appointment(form_data, page:Page):
         
         # Validate required fields
         if not all([patient_id, doctor_id, appointment_date, appointment_time]):
-            # Show error alert
             print("Error", [patient_id, doctor_id, appointment_date, appointment_time])
-            return
+            return None
         
         # Add appointment to database
         appointment_id = db.add_appointment(
@@ -1635,39 +1933,20 @@ def save_appointment(form_data, page:Page):
             doctor_id,
             appointment_date,
             appointment_time,
-            reason
+            reason,
+            on_conflict="raise"
         )
         
-        if appointment_id:
-            # Close form and refresh dashboard
-            page.overlay.pop()
-            page.overlay.clear()
-            page.update()
-            page.overlay.append(
-                Container(
-                    content=Text("Appointment saved successfully!", color=Colors.WHITE),
-                    padding=padding.all(10),
-                    bgcolor=Colors.GREEN_600,
-                    border_radius=BorderRadius(
-                        top_left=8, top_right=8,
-                        bottom_left=8, bottom_right=8
-                    ),
-                    height=50,
-                    alignment=alignment.center,
-                )
-            )
-            page.update()
-            time.sleep(2)
-            page.overlay.pop()
-            page.update()
-            # Here you should refresh the dashboard data
+        return appointment_id
+    except AppointmentConflict:
+        raise
     except Exception as e:
         print(f"Error saving appointment: {e}")
+        return None
 
-def save_prescription(form_data, page):
-    """Save new prescription to database"""
+def save_prescription(db: HospitalDB, form_data):
+    """Save new prescription to database; returns its id, or None if it was not saved"""
     try:
-        db = HospitalDB()
         record_id = int(form_data.get("record_id"))
         medication = form_data.get("medication")
         dosage = form_data.get("dosage")
@@ -1677,8 +1956,7 @@ def save_prescription(form_data, page):
         
         # Validate required fields
         if not all([record_id, medication]):
-            # Show error alert
-            return
+            return None
         
         # Add prescription to database
         prescription_id = db.add_prescription(
@@ -1690,36 +1968,14 @@ def save_prescription(form_data, page):
             notes
         )
         
-        if prescription_id:
-            # Close form and refresh dashboard
-            print(len(page.overlay))
-            page.overlay.pop()
-            page.update()
-            page.overlay.append(
-                Container(
-                    content=Text("Prescription saved successfully!", color=Colors.WHITE),
-                    padding=padding.all(10),
-                    bgcolor=Colors.GREEN_600,
-                    border_radius=BorderRadius(
-                        top_left=8, top_right=8,
-                        bottom_left=8, bottom_right=8
-                    ),
-                    height=50,
-                    alignment=alignment.bottom_right,
-                )
-            )
-            page.update()
-            time.sleep(2)
-            page.overlay.pop()
-            page.update()
-            # Here you should refresh the dashboard data
+        return prescription_id
     except Exception as e:
         print(f"Error saving prescription: {e}")
+        return None
 
-def save_bill(form_data, page):
-    """Save new bill to database"""
+def save_bill(db: HospitalDB, form_data):
+    """Save new bill to database; returns its id, or None if it was not saved"""
     try:
-        db = HospitalDB()
         patient_id = int(form_data.get("patient_id"))
         record_id = form_data.get("record_id")
         if record_id:
@@ -1728,8 +1984,7 @@ def save_bill(form_data, page):
         
         # Validate required fields
         if not all([patient_id, amount]):
-            # Show error alert
-            return
+            return None
         
         # Add bill to database
         bill_id = db.add_bill(
@@ -1738,35 +1993,14 @@ def save_bill(form_data, page):
             record_id
         )
         
-        if bill_id:
-            # Close form and refresh dashboard
-            page.overlay.pop()
-            page.update()
-            page.overlay.append(
-                Container(
-                    content=Text("Billing saved successfully!", color=Colors.WHITE),
-                    padding=padding.all(10),
-                    bgcolor=Colors.GREEN_600,
-                    border_radius=BorderRadius(
-                        top_left=8, top_right=8,
-                        bottom_left=8, bottom_right=8
-                    ),
-                    height=50,
-                    alignment=alignment.bottom_right,
-                )
-            )
-            page.update()
-            time.sleep(2)
-            page.overlay.pop()
-            page.update()
-            # Here you should refresh the dashboard data
+        return bill_id
     except Exception as e:
         print(f"Error saving bill: {e}")
+        return None
 
-def save_medical_record(form_data, page):
-    """Save new medical record to database"""
+def save_medical_record(db: HospitalDB, form_data):
+    """Save new medical record to database; returns its id, or None if it was not saved"""
     try:
-        db = HospitalDB()
         patient_id = int(form_data.get("patient_id"))
         doctor_id = int(form_data.get("doctor_id"))
         diagnosis = form_data.get("diagnosis")
@@ -1775,8 +2009,7 @@ def save_medical_record(form_data, page):
         
         # Validate required fields
         if not all([patient_id, doctor_id, diagnosis, treatment]):
-            # Show error alert
-            return
+            return None
         
         # Add medical record to database
         record_id = db.add_medical_record(
@@ -1787,40 +2020,22 @@ def save_medical_record(form_data, page):
             notes
         )
         
-        if record_id:
-            # Close form and refresh dashboard
-            page.overlay.pop()
-            page.update()
-            page.overlay.append(
-                Container(
-                    content=Text("Medical Record saved successfully!", color=Colors.WHITE),
-                    padding=padding.all(10),
-                    bgcolor=Colors.GREEN_600,
-                    border_radius=BorderRadius(
-                        top_left=8, top_right=8,
-                        bottom_left=8, bottom_right=8
-                    ),
-                    height=50,
-                    alignment=alignment.bottom_right,
-                )
-            )
-            page.update()
-            time.sleep(2)
-            page.overlay.pop()
-            page.update()
-            # Here you should refresh the dashboard data
+        return record_id
     except Exception as e:
         print(f"Error saving medical record: {e}")
+        return None
 
-def patient_details(patient_id: int):
-    db = HospitalDB()
-    patient_data = db.get_patient(patient_id)
-    if not patient_data:
+def patient_details(patient_id: int, db: HospitalDB = None):
+    db = db or HospitalDB()
+    timeline = db.get_patient_timeline(patient_id)
+    if not timeline:
         return Text("Patient not found", color=Colors.RED)
 
-    medical_records = db.get_patient_records(patient_id)
-    prescriptions = db.get_patient_prescriptions(patient_id)
-    bills = db.get_patient_bills(patient_id)
+    patient_data = timeline["patient"]
+    medical_records = [event for event in timeline["events"] if event["kind"] == "record"]
+    prescriptions = [event for event in timeline["events"] if event["kind"] == "prescription"]
+    bills = [event for event in timeline["events"] if event["kind"] == "bill"]
+    next_before = timeline["next_before"]
 
     # Blue color palette
     PRIMARY_BLUE = "#1976D2"
@@ -2111,7 +2326,51 @@ def patient_details(patient_id: int):
             margin=margin.only(top=10, bottom=15),
         )
 
-    return Container(
+    records_column = Column(
+        controls=[record_card(record) for record in medical_records] or [Text("No medical records available")],
+        spacing=10,
+    )
+    prescriptions_column = Column(
+        controls=[prescription_card(prescription) for prescription in prescriptions] or [Text("No prescriptions available")],
+        spacing=10,
+    )
+    bills_column = Column(
+        controls=[bill_card(bill) for bill in bills] or [Text("No billing information available")],
+        spacing=10,
+    )
+
+    def load_older(e):
+        nonlocal next_before
+        page_data = db.get_patient_timeline(patient_id, before=next_before)
+        if not page_data:
+            return
+        next_before = page_data["next_before"]
+        for event in page_data["events"]:
+            if event["kind"] == "record":
+                items, column, card = medical_records, records_column, record_card
+            elif event["kind"] == "prescription":
+                items, column, card = prescriptions, prescriptions_column, prescription_card
+            else:
+                items, column, card = bills, bills_column, bill_card
+            if not items:
+                column.controls.clear()
+            items.append(event)
+            column.controls.append(card(event))
+        for button in load_older_buttons:
+            button.visible = next_before is not None
+        details.update()
+
+    load_older_buttons = [
+        TextButton(
+            "Load older history",
+            icon=Icons.HISTORY,
+            on_click=load_older,
+            visible=next_before is not None,
+        )
+        for _ in range(3)
+    ]
+
+    details = Container(
         content=Column(
             controls=[
                 profile_header(),
@@ -2143,10 +2402,8 @@ def patient_details(patient_id: int):
                                 content=Column(
                                     controls=[
                                         section_header("Medical Records", Icons.MEDICAL_SERVICES),
-                                        Column(
-                                            controls=[record_card(record) for record in medical_records],
-                                            spacing=10,
-                                        ) if medical_records else Text("No medical records available"),
+                                        records_column,
+                                        load_older_buttons[0],
                                     ],
                                     scroll=ScrollMode.ADAPTIVE,
                                 ),
@@ -2160,10 +2417,8 @@ def patient_details(patient_id: int):
                                 content=Column(
                                     controls=[
                                         section_header("Prescriptions", Icons.MEDICATION),
-                                        Column(
-                                            controls=[prescription_card(prescription) for prescription in prescriptions],
-                                            spacing=10,
-                                        ) if prescriptions else Text("No prescriptions available"),
+                                        prescriptions_column,
+                                        load_older_buttons[1],
                                     ],
                                     scroll=ScrollMode.ADAPTIVE,
                                 ),
@@ -2177,10 +2432,8 @@ def patient_details(patient_id: int):
                                 content=Column(
                                     controls=[
                                         section_header("Billing History", Icons.RECEIPT),
-                                        Column(
-                                            controls=[bill_card(bill) for bill in bills],
-                                            spacing=10,
-                                        ) if bills else Text("No billing information available"),
+                                        bills_column,
+                                        load_older_buttons[2],
                                     ],
                                     scroll=ScrollMode.ADAPTIVE,
                                 ),
@@ -2199,6 +2452,7 @@ def patient_details(patient_id: int):
         bgcolor=Colors.WHITE,
         expand=True,
     )
+    return details
 
 def dob_to_age(dob: str) -> str:
     # dob format = yyyy-mm-dd
@@ -2448,15 +2702,27 @@ def add_patient_form(db: HospitalDB, page: Page, on_add_complete):
     return form_content
 
 def patients(db: HospitalDB, page: Page) -> Container:
-    patient_list = db.get_all_patients()
-    patient_controls = []
+    """
+    Patient grid that only ever holds a window of cards.
+
+    Pages are fetched with keyset pagination (or sliced from ranked search ids) as the
+    grid nears either edge, and cards leaving the window go back to a pool to be
+    rebound to the next patients instead of being rebuilt.
+    """
+    # Patients currently shown, in grid order; each carries its position for search paging
+    window = []
+    state = {"search_ids": None, "has_before": False, "has_after": True}
+    card_pool = []
+    # Held while the window and grid controls change: scrolling runs on the UI thread,
+    # searches on the debouncer's timer and refreshes on the change notifier's thread
+    grid_lock = threading.RLock()
 
     def close_patient_details(e):
         page.overlay.pop()
         page.update()
 
     def show_patient_details(patient_id):
-        patient_detail_content = patient_details(patient_id)
+        patient_detail_content = patient_details(patient_id, db)
         
         overlay_container = Container(
             content=Column(
@@ -2499,19 +2765,136 @@ def patients(db: HospitalDB, page: Page) -> Container:
         page.overlay.append(overlay_container)
         page.update()
     
+    def search_rows(chunk, start):
+        """Patients for a slice of search ids, with the position each has in the results"""
+        positions = {patient_id: start + offset for offset, patient_id in enumerate(chunk)}
+        rows = db.get_patients_by_ids(chunk)
+        return rows, [positions[row["id"]] for row in rows]
+
+    def fetch_after(last):
+        """Next page after the last shown patient, with search positions (None outside a search)"""
+        ids = state["search_ids"]
+        if ids is None:
+            rows = db.get_patients_page(after_id=last["id"] if last else None, limit=PATIENT_PAGE_SIZE + 1)
+            state["has_after"] = len(rows) > PATIENT_PAGE_SIZE
+            return rows[:PATIENT_PAGE_SIZE], None
+        start = last["_pos"] + 1 if last else 0
+        rows, positions = [], []
+        # Patients deleted since the search are dropped, so a slice can come back short or empty
+        while not rows and start < len(ids):
+            chunk = ids[start:start + PATIENT_PAGE_SIZE]
+            rows, positions = search_rows(chunk, start)
+            start += len(chunk)
+        state["has_after"] = start < len(ids)
+        return rows, positions
+
+    def fetch_before(first):
+        """Page before the first shown patient, with search positions (None outside a search)"""
+        ids = state["search_ids"]
+        if ids is None:
+            rows = db.get_patients_page(before_id=first["id"], limit=PATIENT_PAGE_SIZE)
+            state["has_before"] = len(rows) == PATIENT_PAGE_SIZE
+            return rows, None
+        end = first["_pos"]
+        rows, positions = [], []
+        while not rows and end > 0:
+            start = max(end - PATIENT_PAGE_SIZE, 0)
+            rows, positions = search_rows(ids[start:end], start)
+            end = start
+        state["has_before"] = end > 0
+        return rows, positions
+
+    def take_card(patient, position):
+        patient["_pos"] = position
+        card = card_pool.pop() if card_pool else patient_card()
+        bind_card(card, patient)
+        return card
+
+    def release_cards(cards):
+        card_pool.extend(cards)
+
+    def load_after():
+        rows, positions = fetch_after(window[-1] if window else None)
+        if not rows:
+            return None
+        anchor = patient_grid.controls[-1].key if patient_grid.controls else None
+        if positions is None:
+            base = window[-1]["_pos"] + 1 if window else 0
+            positions = range(base, base + len(rows))
+        for patient, position in zip(rows, positions):
+            window.append(patient)
+            patient_grid.controls.append(take_card(patient, position))
+
+        # Drop whole grid rows from the top once the window is full
+        excess = len(window) - PATIENT_WINDOW_SIZE
+        excess -= excess % PATIENT_GRID_COLUMNS
+        if excess > 0:
+            release_cards(patient_grid.controls[:excess])
+            del patient_grid.controls[:excess]
+            del window[:excess]
+            state["has_before"] = True
+            return anchor
+        return None
+
+    def load_before():
+        rows, positions = fetch_before(window[0])
+        if not rows:
+            state["has_before"] = False
+            return None
+        anchor = patient_grid.controls[0].key
+        if positions is None:
+            positions = range(window[0]["_pos"] - len(rows), window[0]["_pos"])
+        cards = [take_card(patient, position) for patient, position in zip(rows, positions)]
+        window[:0] = rows
+        patient_grid.controls[:0] = cards
+
+        excess = len(window) - PATIENT_WINDOW_SIZE
+        if excess > 0:
+            release_cards(patient_grid.controls[-excess:])
+            del patient_grid.controls[-excess:]
+            del window[-excess:]
+            state["has_after"] = True
+        return anchor
+
+    def on_grid_scroll(e):
+        if e.max_scroll_extent is None:
+            return
+        # Skip scroll events while another page load, search or refresh is running
+        if not grid_lock.acquire(blocking=False):
+            return
+        try:
+            near_end = e.pixels >= e.max_scroll_extent - PATIENT_SCROLL_THRESHOLD
+            near_start = e.pixels <= PATIENT_SCROLL_THRESHOLD
+            if not ((near_end and state["has_after"]) or (near_start and state["has_before"] and window)):
+                return
+            anchor = load_after() if near_end and state["has_after"] else load_before()
+            patient_grid.update()
+            # Keep the cards the user was looking at in view after the window shifted
+            if anchor is not None:
+                patient_grid.scroll_to(key=anchor, duration=0)
+        finally:
+            grid_lock.release()
+
+    def reset(search_ids=None):
+        """Start the grid over from the first page (of all patients or of search results)"""
+        release_cards(patient_grid.controls)
+        patient_grid.controls = []
+        window.clear()
+        state.update(search_ids=search_ids, has_before=False, has_after=True)
+        load_after()
+
+    def apply_search(query):
+        search_ids = db.search_index("patients").search(query)
+        with grid_lock:
+            reset(search_ids)
+            patient_grid.update()
+            patient_grid.scroll_to(offset=0, duration=0)
+
+    search_debouncer = Debouncer(SEARCH_DEBOUNCE_SECONDS, apply_search, SEARCH_EXECUTOR)
+
     def search_patients(e):
-        search_term = search_field.value.lower()
-        filtered_patients = [p for p in db.get_all_patients() if search_term in p.get("name", "").lower()]
-        
-        # Clear the existing patient controls
-        patient_grid.controls.clear()
-        
-        # Add the filtered patients
-        for patient in filtered_patients:
-            patient_grid.controls.append(patient_card(patient))
-        
-        page.update()
-    
+        search_debouncer(search_field.value)
+
     def open_add_patient_form(e):
         # This function would show a form to add a new patient
         add_patient_content = add_patient_form(db, page, on_add_complete)
@@ -2558,28 +2941,24 @@ def patients(db: HospitalDB, page: Page) -> Container:
         page.update()
     
     def on_add_complete():
-        # Refresh the patient list
-        patient_list = db.get_all_patients()
-        patient_grid.controls.clear()
-        
-        for patient in patient_list:
-            patient_grid.controls.append(patient_card(patient))
-        
+        # Refresh the patient list, keeping any active search
+        apply_search(search_field.value)
         page.overlay.pop()
         page.update()
-    
-    def patient_card(patient_data):
+
+    def patient_card():
+        """Build an unbound card; bind_card fills it in for a patient"""
+        name_text = Text("", weight=FontWeight.BOLD, size=16)
+        age_text = Text("", size=12, color=Colors.GREY_600)
+        status_text = Text("", color=Colors.WHITE, size=12)
+        status_badge = Container(
+            content=status_text,
+            padding=padding.only(left=10, right=10, top=3, bottom=3),
+            border_radius=BorderRadius(20, 20, 20, 20),
+        )
+        phone_text = Text("", size=14)
+        appointment_text = Text("", size=14)
         condition_chips = Row(spacing=5)
-        if patient_data.get("conditions"):
-            for condition in patient_data["conditions"]:
-                condition_chips.controls.append(
-                    Container(
-                        content=Text(condition, size=12),
-                        padding=padding.only(left=10, right=10, top=5, bottom=5),
-                        bgcolor=Colors.BLACK12,
-                        border_radius=BorderRadius(20, 20, 20, 20),
-                    )
-                )
 
         card = Container(
             content=Column(
@@ -2597,22 +2976,13 @@ def patients(db: HospitalDB, page: Page) -> Container:
                                         alignment=alignment.center,
                                     ),
                                     Column(
-                                        controls=[
-                                            Text(patient_data.get("name", ""), weight=FontWeight.BOLD, size=16),
-                                            Text(f"{dob_to_age(patient_data.get('date_of_birth', ''))} yrs • {patient_data.get('gender', '')}", 
-                                                size=12, color=Colors.GREY_600),
-                                        ],
+                                        controls=[name_text, age_text],
                                         spacing=2,
                                     ),
                                 ],
                                 alignment=MainAxisAlignment.START,
                             ),
-                            Container(
-                                content=Text(patient_data.get("status", "").capitalize(), color=Colors.WHITE, size=12),
-                                padding=padding.only(left=10, right=10, top=3, bottom=3),
-                                bgcolor=Colors.BLUE if patient_data.get("status").lower() == "active" else Colors.GREY_500,
-                                border_radius=BorderRadius(20, 20, 20, 20),
-                            ),
+                            status_badge,
                         ],
                         alignment=MainAxisAlignment.SPACE_BETWEEN,
                     ),
@@ -2620,7 +2990,7 @@ def patients(db: HospitalDB, page: Page) -> Container:
                     Row(
                         controls=[
                             Icon(Icons.PHONE, size=16, color=Colors.GREY_600),
-                            Text(patient_data.get("phone", ""), size=14),
+                            phone_text,
                         ],
                         spacing=5,
                         vertical_alignment=CrossAxisAlignment.CENTER,
@@ -2628,7 +2998,7 @@ def patients(db: HospitalDB, page: Page) -> Container:
                     Row(
                         controls=[
                             Icon(Icons.CALENDAR_TODAY, size=16, color=Colors.GREY_600),
-                            Text(f"Next Appointment: {patient_data.get('next_appointment', '')}", size=14),
+                            appointment_text,
                         ],
                         spacing=5,
                         vertical_alignment=CrossAxisAlignment.CENTER,
@@ -2655,12 +3025,12 @@ def patients(db: HospitalDB, page: Page) -> Container:
                                 border_radius=BorderRadius(5, 5, 5, 5),
                                 alignment=alignment.center,
                                 expand=True,
-                                on_click=lambda e: show_patient_details(patient_data.get('id'))
+                                on_click=lambda e: show_patient_details(card.data["patient"].get('id'))
                             ),
                             Container(
                                 content=Icon(Icons.MORE_VERT, size=20),
                                 padding=padding.only(left=10, right=10),
-                                on_click=lambda e: print(f"More options for {patient_data.get('name')}")
+                                on_click=lambda e: print(f"More options for {card.data['patient'].get('name')}")
                             ),
                         ],
                         alignment=MainAxisAlignment.SPACE_BETWEEN,
@@ -2678,15 +3048,47 @@ def patients(db: HospitalDB, page: Page) -> Container:
                 offset=Offset(0, 2),
             ),
             width=400,
-            height=400
+            height=400,
         )
-
+        card.data = {
+            "patient": None,
+            "name": name_text,
+            "age": age_text,
+            "status": status_text,
+            "status_badge": status_badge,
+            "phone": phone_text,
+            "appointment": appointment_text,
+            "conditions": condition_chips,
+        }
         return card
 
+    def bind_card(card, patient_data):
+        """Point a (new or recycled) card at a patient"""
+        refs = card.data
+        refs["patient"] = patient_data
+        card.key = str(patient_data["id"])
+        status = patient_data.get("status") or ""
+        refs["name"].value = patient_data.get("name", "")
+        refs["age"].value = f"{dob_to_age(patient_data.get('date_of_birth', ''))} yrs • {patient_data.get('gender', '')}"
+        refs["status"].value = status.capitalize()
+        refs["status_badge"].bgcolor = Colors.BLUE if status.lower() == "active" else Colors.GREY_500
+        refs["phone"].value = patient_data.get("phone", "")
+        refs["appointment"].value = f"Next Appointment: {patient_data.get('next_appointment', '')}"
+        refs["conditions"].controls = [
+            Container(
+                content=Text(condition, size=12),
+                padding=padding.only(left=10, right=10, top=5, bottom=5),
+                bgcolor=Colors.BLACK12,
+                border_radius=BorderRadius(20, 20, 20, 20),
+            )
+            for condition in patient_data.get("conditions") or []
+        ]
+
     # Create the search field
     search_field = TextField(
         label="Search patients",
         prefix_icon=Icons.SEARCH,
+        on_change=search_patients,
         on_submit=search_patients,
         border_radius=8,
         expand=True,
@@ -2710,22 +3112,49 @@ def patients(db: HospitalDB, page: Page) -> Container:
         on_click=open_add_patient_form,
     )
     
-    # Create the patient grid
+    def refresh(changes):
+        """Rebind or drop the cards of changed patients; new ones arrive by scrolling"""
+        with grid_lock:
+            if state["search_ids"] is not None:
+                apply_search(search_field.value)
+                return
+            changed = changes.get("patients", set())
+            shown = [patient["id"] for patient in window if patient["id"] in changed]
+            rows = {row["id"]: row for row in db.get_patients_by_ids(shown)}
+            for index in reversed(range(len(window))):
+                patient_id = window[index]["id"]
+                if patient_id not in changed:
+                    continue
+                row = rows.get(patient_id)
+                if row and row.get("status") == "active":
+                    row["_pos"] = window[index]["_pos"]
+                    window[index] = row
+                    bind_card(patient_grid.controls[index], row)
+                else:
+                    release_cards([patient_grid.controls[index]])
+                    del patient_grid.controls[index]
+                    del window[index]
+            if not state["has_after"]:
+                state["has_after"] = True
+                if len(window) < PATIENT_PAGE_SIZE:
+                    load_after()
+            patient_grid.update()
+
+    # Create the patient grid; it scrolls on its own so it can page as it nears either end
     patient_grid = GridView(
-        controls=[patient_card(patient) for patient in patient_list],
+        controls=[],
         expand=1,
-        runs_count=3,
+        runs_count=PATIENT_GRID_COLUMNS,
         spacing=7,
         run_spacing=10,
-        child_aspect_ratio=1.3
+        child_aspect_ratio=1.3,
+        height=max(page.height - 220, 400) if page.height else None,
+        on_scroll=on_grid_scroll,
+        on_scroll_interval=100,
     )
+    reset()
 
-    for patient in patient_list:
-        patient_controls.append(
-            patient_card(patient)
-        )
-
-    return Container(
+    view = Container(
         Column(
             controls=[
                 Text("Patients", color=Colors.BLACK87, size=24),
@@ -2744,18 +3173,19 @@ def patients(db: HospitalDB, page: Page) -> Container:
             spacing=20,
         ),
         expand=True,
-        padding=20
+        padding=20,
+        data={"refresh": refresh},
     )
+    return view
 
 def doctors_and_nurses(db: HospitalDB, page: Page) -> Container:
-    doctor_list = db.get_all_users("doctor")
-    doctor_list2 = db.get_all_users("Doctor")
-    nurse_list = db.get_all_users("nurse")
-    nurse_list2 = db.get_all_users("Noctor")
-    
-    # Combined list for searching
-    all_users = doctor_list + nurse_list + doctor_list2 + nurse_list2
+    # Doctors and nurses in one query; each user's role is already normalized
+    all_users = db.get_staff([Role.DOCTOR, Role.NURSE])
     displayed_users = all_users.copy()
+
+    def role_label(user):
+        role = Role.parse(user.get("role"))
+        return role.label if role else "Nurse"
     
     # Form field values
     name_value = TextField(label="Full Name", hint_text="Enter full name")
@@ -2772,23 +3202,33 @@ def doctors_and_nurses(db: HospitalDB, page: Page) -> Container:
     phone_value = TextField(label="Phone", hint_text="Enter phone number")
     address_value = TextField(label="Address", hint_text="Enter address", multiline=True, min_lines=2)
     
-    def search_users(e):
-        query = search_field.value.lower()
-        if query:
-            displayed_users.clear()
-            for user in all_users:
-                if (query in user.get("name", "").lower() or 
-                    query in user.get("specialization", "").lower() or 
-                    query in user.get("role", "").lower() or 
-                    query in user.get("email", "").lower()):
-                    displayed_users.append(user)
-        else:
-            displayed_users.clear()
+    users_by_id = {user["id"]: user for user in all_users}
+    # Cards are built once per user and reused across searches
+    cards = {}
+
+    def card_for(user):
+        card = cards.get(user["id"])
+        if card is None:
+            card = cards[user["id"]] = user_card(user, role_label(user))
+        return card
+
+    def apply_search(query):
+        # Ranked ids from the shared index; admins and others are dropped by users_by_id
+        ids = db.search_index("users").search(query)
+        displayed_users.clear()
+        if ids is None:
             displayed_users.extend(all_users)
+        else:
+            displayed_users.extend(users_by_id[user_id] for user_id in ids if user_id in users_by_id)
         
         # Update the grid view with filtered results
-        grid_view.controls = [user_card(user, "Doctor" if user in doctor_list + doctor_list2 else "Nurse") for user in displayed_users]
-        page.update()
+        grid_view.controls = [card_for(user) for user in displayed_users]
+        grid_view.update()
+
+    search_debouncer = Debouncer(SEARCH_DEBOUNCE_SECONDS, apply_search, SEARCH_EXECUTOR)
+
+    def search_users(e):
+        search_debouncer(search_field.value)
     
     def show_add_dialog(e):
         # Clear form fields
@@ -2811,7 +3251,7 @@ def doctors_and_nurses(db: HospitalDB, page: Page) -> Container:
     
     def handle_role_change(e):
         # Show/hide specialization field based on role
-        if role_value.value.lower() == "doctor":
+        if Role.parse(role_value.value) == Role.DOCTOR:
             specialization_container.visible = True
         else:
             specialization_container.visible = False
@@ -2831,27 +3271,22 @@ def doctors_and_nurses(db: HospitalDB, page: Page) -> Container:
                 email=email_value.value,
                 password=password_value.value,
                 role=role_value.value,
-                specialization=specialization_value.value if role_value.value == "Doctor" else None,
+                specialization=specialization_value.value if Role.parse(role_value.value) == Role.DOCTOR else None,
                 phone=phone_value.value,
                 address=address_value.value
             )
             
             if user_id:
                 # Refresh the user list
-                if role_value.value == "Doctor":
-                    doctor_list.clear()
-                    doctor_list.extend(db.get_all_users("Doctor"))
-                else:
-                    nurse_list.clear()
-                    nurse_list.extend(db.get_all_users("Nurse"))
-                
                 all_users.clear()
-                all_users.extend(doctor_list + nurse_list)
+                all_users.extend(db.get_staff([Role.DOCTOR, Role.NURSE]))
+                users_by_id.clear()
+                users_by_id.update((user["id"], user) for user in all_users)
                 displayed_users.clear()
                 displayed_users.extend(all_users)
                 
                 # Update the grid view
-                grid_view.controls = [user_card(user, "Doctor" if user in doctor_list else "Nurse") for user in displayed_users]
+                grid_view.controls = [card_for(user) for user in displayed_users]
                 
                 # Close dialog and show success message
                 add_dialog.open = False
@@ -3014,7 +3449,7 @@ def doctors_and_nurses(db: HospitalDB, page: Page) -> Container:
         return card
 
     # Initial user cards
-    user_controls = [user_card(user, "Doctor" if user in doctor_list else "Nurse") for user in displayed_users]
+    user_controls = [card_for(user) for user in displayed_users]
     
     # Grid view with reference for updating
     grid_view = GridView(
@@ -3026,6 +3461,15 @@ def doctors_and_nurses(db: HospitalDB, page: Page) -> Container:
         child_aspect_ratio=1.3
     )
 
+    def refresh(changes):
+        """Reload the staff list and rebuild only the cards of changed users"""
+        for user_id in changes.get("users", ()):
+            cards.pop(user_id, None)
+        all_users[:] = db.get_staff([Role.DOCTOR, Role.NURSE])
+        users_by_id.clear()
+        users_by_id.update((user["id"], user) for user in all_users)
+        apply_search(search_field.value)
+
     return Container(
         Column(
             controls=[
@@ -3046,41 +3490,177 @@ def doctors_and_nurses(db: HospitalDB, page: Page) -> Container:
         ),
         padding=padding.all(20),
         expand=True,
+        data={"refresh": refresh},
     )
 
-GEMINI_API_KEY = "YOUR_API_KEY"
-genai.configure(api_key=GEMINI_API_KEY)
+def calendar_view(db: HospitalDB, page: Page) -> Container:
+    """
+    Week/month appointment calendar for one department or the whole hospital.
 
+    Each render is a single get_appointments_range() call for the visible days.
+    """
+    doctors = db.get_all_users(role="doctor")
+    state = {"mode": "week", "anchor": datetime.now().date(), "department": "all"}
 
-def profile_page(page: Page, db: HospitalDB) -> Container:
-    user = {}
-    try:
-        with open("user_session.txt", "r") as f:
-            user["id"] = f.readline().replace("\n","")
-            user["name"] = f.readline().replace("\n","")
-            user["email"] = f.readline().replace("\n","")
-            user["role"] = f.readline().replace("\n","")
-    except:
-        print("Error occurred")
-    print(user)
+    def visible_range():
+        anchor = state["anchor"]
+        if state["mode"] == "week":
+            start = anchor - timedelta(days=anchor.weekday())
+            return start, start + timedelta(days=6)
+        # Month grid: whole weeks from the Monday before the 1st to the Sunday after the last day
+        first = anchor.replace(day=1)
+        next_month = (first + timedelta(days=32)).replace(day=1)
+        start = first - timedelta(days=first.weekday())
+        end = next_month - timedelta(days=1)
+        return start, end + timedelta(days=6 - end.weekday())
 
-    full_info = db.get_user(user_id=user["id"])
-    full_info.pop("password")
+    def appointment_chip(appointment):
+        return Container(
+            content=Column(
+                controls=[
+                    Text(f"{appointment['appointment_time']} {appointment['patient_name']}", size=12, weight="bold"),
+                    Text(appointment["doctor_name"], size=11, color=Colors.GREY_700),
+                ],
+                spacing=0,
+            ),
+            padding=padding.all(6),
+            bgcolor=Colors.GREY_200 if appointment["status"] == "cancelled" else Colors.BLUE_50,
+            border_radius=BorderRadius(6, 6, 6, 6),
+        )
+
+    def day_cell(day, appointments, max_items=None):
+        shown = appointments if max_items is None else appointments[:max_items]
+        controls = [
+            Text(
+                day.strftime("%a %d") if state["mode"] == "week" else str(day.day),
+                size=14,
+                weight="bold",
+                color=Colors.BLUE_700 if day == datetime.now().date() else Colors.BLACK87,
+            )
+        ]
+        controls.extend(appointment_chip(a) for a in shown)
+        if len(appointments) > len(shown):
+            controls.append(Text(f"+{len(appointments) - len(shown)} more", size=11, color=Colors.BLUE_700))
+        return Container(
+            content=Column(controls=controls, spacing=4, scroll=ScrollMode.AUTO if max_items is None else None),
+            padding=padding.all(8),
+            bgcolor=Colors.WHITE if state["mode"] == "week" or day.month == state["anchor"].month else Colors.GREY_50,
+            border=border.all(1, Colors.GREY_300),
+            expand=True,
+            height=500 if state["mode"] == "week" else 120,
+        )
+
+    def render(update=True):
+        start, end = visible_range()
+        if state["department"] == "all":
+            doctor_ids = None
+        else:
+            doctor_ids = [d["id"] for d in doctors if d.get("specialization") == state["department"]]
+
+        by_day = {}
+        for appointment in db.get_appointments_range(start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"), doctor_ids):
+            by_day.setdefault(appointment["appointment_date"], []).append(appointment)
+        for appointments in by_day.values():
+            appointments.sort(key=lambda a: a["appointment_time"])
+
+        days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+        if state["mode"] == "week":
+            title.value = f"Week of {start.strftime('%b %d, %Y')}"
+            grid.controls = [
+                Row(controls=[day_cell(day, by_day.get(day.strftime("%Y-%m-%d"), [])) for day in days], spacing=0)
+            ]
+        else:
+            title.value = state["anchor"].strftime("%B %Y")
+            grid.controls = [
+                Row(
+                    controls=[Text(name, size=12, color=Colors.GREY_600, expand=True, text_align="center")
+                              for name in ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")],
+                    spacing=0,
+                )
+            ] + [
+                Row(
+                    controls=[day_cell(day, by_day.get(day.strftime("%Y-%m-%d"), []), max_items=3)
+                              for day in days[week:week + 7]],
+                    spacing=0,
+                )
+                for week in range(0, len(days), 7)
+            ]
+        if update:
+            page.update()
+
+    def shift(direction):
+        if state["mode"] == "week":
+            state["anchor"] += timedelta(days=7 * direction)
+        else:
+            first = state["anchor"].replace(day=1)
+            state["anchor"] = (first + timedelta(days=32)).replace(day=1) if direction > 0 \
+                else (first - timedelta(days=1)).replace(day=1)
+        render()
+
+    def change_mode(e):
+        state["mode"] = e.control.value
+        render()
+
+    def change_department(e):
+        state["department"] = e.control.value
+        render()
+
+    title = Text("", size=18, weight="bold", color=Colors.BLACK87)
+    grid = Column(spacing=0)
+
+    controls_row = Row(
+        controls=[
+            IconButton(icon=Icons.CHEVRON_LEFT, on_click=lambda _: shift(-1)),
+            title,
+            IconButton(icon=Icons.CHEVRON_RIGHT, on_click=lambda _: shift(1)),
+            Container(expand=True),
+            Dropdown(
+                label="Department",
+                value="all",
+                options=[dropdown.Option(key="all", text="All departments")] + [
+                    dropdown.Option(specialization)
+                    for specialization in sorted({d["specialization"] for d in doctors if d.get("specialization")})
+                ],
+                on_change=change_department,
+                width=250,
+            ),
+            Dropdown(
+                label="View",
+                value="week",
+                options=[dropdown.Option(key="week", text="Week"), dropdown.Option(key="month", text="Month")],
+                on_change=change_mode,
+                width=150,
+            ),
+        ],
+        vertical_alignment=CrossAxisAlignment.CENTER,
+    )
 
-    # Get doctor's patients
-    patients = db.get_all_patients()
-    doctor_patients = [p for p in patients if p['id'] in [r['patient_id'] for r in db.get_doctor_records(user["id"])]]
+    # The view isn't on the page yet, so build the first grid without an update
+    render(update=False)
+
+    return Container(
+        Column(
+            controls=[
+                Text("Calendar", color=Colors.BLACK87, size=24, weight=FontWeight.BOLD),
+                controls_row,
+                grid,
+            ],
+            spacing=20,
+        ),
+        padding=padding.all(20),
+        expand=True,
+        data={"refresh": lambda changes: render()},
+    )
 
-    # Get doctor's medical records
-    medical_records = db.get_doctor_records(user["id"])
 
-    # Get doctor's appointments
-    appointments = db.get_appointments(doctor_id=user["id"])
+def profile_page(page: Page, db: HospitalDB, user: dict) -> Container:
+
+    full_info = db.get_user(user_id=user["id"])
+    full_info.pop("password")
 
-    # Get doctor's prescriptions
-    prescriptions = []
-    for record in medical_records:
-        prescriptions.extend(db.get_prescriptions(record["id"]))
+    # Counts and the first page of patients, records, appointments and prescriptions
+    summary = db.get_doctor_profile_summary(user["id"])
+    counts = summary["counts"]
 
     # Color scheme
     primary_color = "#3498db"  # Blue
@@ -3154,7 +3734,7 @@ def profile_page(page: Page, db: HospitalDB) -> Container:
                 Container(
                     content=Column(
                         controls=[
-                            Text(str(len(doctor_patients)), size=24, weight=FontWeight.BOLD, color="#ffffff"),
+                            Text(str(counts["patients"]), size=24, weight=FontWeight.BOLD, color="#ffffff"),
                             Text("Patients", size=14, color="#ffffff"),
                         ],
                         spacing=5,
@@ -3169,7 +3749,7 @@ def profile_page(page: Page, db: HospitalDB) -> Container:
                 Container(
                     content=Column(
                         controls=[
-                            Text(str(len(medical_records)), size=24, weight=FontWeight.BOLD, color="#ffffff"),
+                            Text(str(counts["records"]), size=24, weight=FontWeight.BOLD, color="#ffffff"),
                             Text("Records", size=14, color="#ffffff"),
                         ],
                         spacing=5,
@@ -3184,7 +3764,7 @@ def profile_page(page: Page, db: HospitalDB) -> Container:
                 Container(
                     content=Column(
                         controls=[
-                            Text(str(len(appointments)), size=24, weight=FontWeight.BOLD, color="#ffffff"),
+                            Text(str(counts["appointments"]), size=24, weight=FontWeight.BOLD, color="#ffffff"),
                             Text("Appointments", size=14, color="#ffffff"),
                         ],
                         spacing=5,
@@ -3199,7 +3779,7 @@ def profile_page(page: Page, db: HospitalDB) -> Container:
                 Container(
                     content=Column(
                         controls=[
-                            Text(str(len(prescriptions)), size=24, weight=FontWeight.BOLD, color="#ffffff"),
+                            Text(str(counts["prescriptions"]), size=24, weight=FontWeight.BOLD, color="#ffffff"),
                             Text("Prescriptions", size=14, color="#ffffff"),
                         ],
                         spacing=5,
@@ -3522,6 +4102,28 @@ def profile_page(page: Page, db: HospitalDB) -> Container:
             margin=margin.only(bottom=10),
         )
 
+    def section_list(section, card):
+        """Column with the first page of a section and a button that appends the next page"""
+        items = Column(
+            controls=[card(row) for row in summary[section]],
+            spacing=10,
+        )
+
+        def load_more(e):
+            rows = db.get_doctor_profile_page(user["id"], section, offset=len(items.controls))
+            items.controls.extend(card(row) for row in rows)
+            more_button.visible = len(items.controls) < counts[section]
+            section_column.update()
+
+        more_button = TextButton(
+            "Load more",
+            icon=Icons.EXPAND_MORE,
+            on_click=load_more,
+            visible=len(summary[section]) < counts[section],
+        )
+        section_column = Column(controls=[items, more_button], spacing=10)
+        return section_column
+
     # Patients tab content
     patients_content = Container(
         content=Column(
@@ -3549,10 +4151,7 @@ def profile_page(page: Page, db: HospitalDB) -> Container:
                     spacing=10,
                 ),
                 Divider(height=1, color=Colors.BLACK12),
-                Column(
-                    controls=[patient_card(p) for p in doctor_patients],
-                    spacing=10,
-                ),
+                section_list("patients", patient_card),
             ],
             spacing=15,
             scroll=ScrollMode.ADAPTIVE,
@@ -3588,10 +4187,7 @@ def profile_page(page: Page, db: HospitalDB) -> Container:
                     spacing=10,
                 ),
                 Divider(height=1, color=Colors.BLACK12),
-                Column(
-                    controls=[record_card(r) for r in medical_records],
-                    spacing=10,
-                ),
+                section_list("records", record_card),
             ],
             spacing=15,
             scroll=ScrollMode.ADAPTIVE,
@@ -3627,11 +4223,7 @@ def profile_page(page: Page, db: HospitalDB) -> Container:
                     spacing=10,
                 ),
                 Divider(height=1, color=Colors.BLACK12),
-                Column(
-                    controls=[appointment_card(a) for a in appointments],
-                    spacing=10,
-                    scroll=ScrollMode.ADAPTIVE,
-                ),
+                section_list("appointments", appointment_card),
             ],
             spacing=15,
             scroll=ScrollMode.ADAPTIVE,
@@ -3667,11 +4259,7 @@ def profile_page(page: Page, db: HospitalDB) -> Container:
                     spacing=10,
                 ),
                 Divider(height=1, color=Colors.BLACK12),
-                Column(
-                    controls=[prescription_card(p) for p in prescriptions],
-                    spacing=10,
-                    scroll=ScrollMode.ADAPTIVE,
-                ),
+                section_list("prescriptions", prescription_card),
             ],
             spacing=15,
             scroll=ScrollMode.ADAPTIVE,
@@ -3731,39 +4319,228 @@ def profile_page(page: Page, db: HospitalDB) -> Container:
 
     return profile_container
 
-def main(page: Page):
+class ToastManager:
+    """
+    Stacked toast notifications in the page overlay that dismiss themselves.
+
+    Toasts beyond MAX_VISIBLE_TOASTS wait in a queue. Expiry times are kept in a
+    heap served by a single timer, so showing a toast never blocks the caller.
+    """
+
+    def __init__(self, page, duration=TOAST_SECONDS, max_visible=MAX_VISIBLE_TOASTS):
+        self.page = page
+        self.duration = duration
+        self.max_visible = max_visible
+        self.stack = Column(spacing=8, right=20, bottom=20, horizontal_alignment=CrossAxisAlignment.END)
+        self.pending = deque()
+        self.expiries = []
+        self.sequence = itertools.count()
+        self.timer = None
+        self.lock = threading.RLock()
+
+    @classmethod
+    def for_page(cls, page):
+        """The page's toast manager, created on first use"""
+        manager = getattr(page, "toast_manager", None)
+        if manager is None:
+            manager = page.toast_manager = cls(page)
+        return manager
+
+    def show(self, message, kind="success"):
+        with self.lock:
+            self.pending.append((message, kind))
+            self._fill()
+            self._schedule()
+        self._update()
+
+    def _fill(self):
+        while self.pending and len(self.stack.controls) < self.max_visible:
+            message, kind = self.pending.popleft()
+            toast = Container(
+                content=Text(message, color=Colors.WHITE),
+                padding=padding.symmetric(horizontal=16, vertical=10),
+                bgcolor=TOAST_COLORS.get(kind, Colors.GREY_800),
+                border_radius=8,
+                alignment=alignment.center,
+            )
+            self.stack.controls.append(toast)
+            heapq.heappush(self.expiries, (time.monotonic() + self.duration, next(self.sequence), toast))
+
+    def _schedule(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.expiries:
+            delay = max(0, self.expiries[0][0] - time.monotonic())
+            self.timer = threading.Timer(delay, self._expire)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def _expire(self):
+        with self.lock:
+            now = time.monotonic()
+            while self.expiries and self.expiries[0][0] <= now:
+                _, _, toast = heapq.heappop(self.expiries)
+                self.stack.controls.remove(toast)
+            self._fill()
+            self._schedule()
+        self._update()
+
+    def _update(self):
+        if self.stack not in self.page.overlay:
+            self.page.overlay.append(self.stack)
+        self.page.update()
+
+
+class DashboardValues(dict):
+    """Dashboard stats for str.format_map; missing values render as empty text"""
+
+    def __missing__(self, key):
+        return ""
+
+
+# Tables the dashboard statistics are computed from
+DASHBOARD_TABLES = {"patients", "users", "appointments", "medical_records", "billing"}
+
+
+class ViewManager:
+    """
+    Keeps sidebar views alive between visits and refreshes them when their data changes.
+
+    A view can refresh itself in place by putting {"refresh": callback} in its root
+    control's data; callback(changes) receives {table: row ids} for the tables that
+    changed. Views without one are rebuilt. Changes to a hidden view are held until it
+    is shown again, so switching views never goes back to the database on its own.
+    """
+
+    def __init__(self, container):
+        self.container = container
+        self.views = {}
+        self.current = None
+        self.lock = threading.RLock()
+
+    def register(self, name, builder, tables=()):
+        self.views[name] = {"builder": builder, "tables": set(tables), "control": None, "pending": {}}
+
+    def show(self, name, update=True):
+        with self.lock:
+            view = self.views[name]
+            self.current = name
+            pending, view["pending"] = view["pending"], {}
+            refresh = self._refresher(view)
+            if view["control"] is None or (pending and refresh is None):
+                view["control"] = view["builder"]()
+                pending = {}
+            self.container.content.controls = [view["control"]]
+            if update:
+                self.container.update()
+                if pending:
+                    refresh(pending)
+
+    def notify(self, changes):
+        """Refresh the visible view if it depends on changes; mark hidden ones dirty"""
+        with self.lock:
+            for name, view in self.views.items():
+                relevant = {table: rows for table, rows in changes.items() if table in view["tables"]}
+                if not relevant or view["control"] is None:
+                    continue
+                if name != self.current:
+                    for table, rows in relevant.items():
+                        view["pending"].setdefault(table, set()).update(rows)
+                    continue
+                refresh = self._refresher(view)
+                if refresh is not None:
+                    refresh(relevant)
+                else:
+                    view["control"] = view["builder"]()
+                    self.container.content.controls = [view["control"]]
+                    self.container.update()
+
+    def refresh(self, name, changes=None):
+        """Refresh a view in place if it is the one on screen; returns whether it ran"""
+        with self.lock:
+            view = self.views[name]
+            refresh = self._refresher(view)
+            if name != self.current or refresh is None:
+                return False
+            refresh(changes or {})
+            return True
+
+    def _refresher(self, view):
+        control = view["control"]
+        data = getattr(control, "data", None) if control is not None else None
+        return data.get("refresh") if isinstance(data, dict) else None
+
+
+class DashboardRefresher:
+    """
+    Background worker that refreshes the dashboard every `interval` seconds, or
+    sooner when trigger() is called. Refreshes are coalesced: any number of triggers
+    while one is running lead to a single follow-up refresh.
+    """
+
+    def __init__(self, refresh, interval=DASHBOARD_REFRESH_SECONDS):
+        self.refresh = refresh
+        self.interval = interval
+        self.wake = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="dashboard-refresher", daemon=True)
+        self.thread.start()
+
+    def trigger(self):
+        self.wake.set()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake.set()
+
+    def run(self):
+        while True:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            if self.stop_event.is_set():
+                break
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Error refreshing dashboard: {e}")
+
+
+def show_login(page: Page, db: HospitalDB = None):
+    """Route the page to the login screen in this process"""
+    import main as login
+
+    page.controls.clear()
+    login.main(page, db=db)
+
+
+def main(page: Page, db: HospitalDB = None, on_logout=None):
+    """
+    Build the main app in page for the user logged in to this page's session.
+
+    Args:
+        page: Page to render into
+        db: HospitalDB shared with the login screen
+        on_logout: Called after logout to route back to the login screen
+    """
     page.title = 'MediCare'
     page.padding = 0
     page.theme_mode = ThemeMode.LIGHT
 
-    user = {}
+    db = db or HospitalDB()
 
-    try:
-        with open("user_session.txt", "r") as f:
-            user["id"] = f.readline().replace("\n","")
-            user["name"] = f.readline().replace("\n","")
-            user["email"] = f.readline().replace("\n","")
-            user["role"] = f.readline().replace("\n","")
-    except:
-        print("Error occured")
+    user = sessions.get(page.session_id) or sessions.restore(page.session_id, db, persist=not page.web)
     print(user)
 
-    if user == {} and user['id'] == '':
-        try:
-            if getattr(sys, 'frozen', False):
-                # Running as compiled executable
-                script_dir = os.path.dirname(sys.executable)
-            else:
-                # Running as script
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-                
-            main_path = os.path.join(script_dir, 'main.py')
-            subprocess.Popen([sys.executable, main_path])
-        except Exception as e:
-            print(f"Error launching main app: {e}")
-        page.window.close()
-
-    db = HospitalDB()
+    if not user:
+        show_login(page, db)
+        return
 
 
     dashboard_data = db.get_dashboard_stats()
@@ -3774,57 +4551,49 @@ def main(page: Page):
         e.control.bgcolor = Colors.GREY_200 if e.data == "true" else Colors.WHITE
         e.control.update()
 
+    def navigate(name):
+        # Navigating also keeps the session alive; an expired one goes back to login
+        if sessions.get(page.session_id) is None:
+            logout(None)
+            return False
+        views.show(name)
+        return True
+
     def on_click_dashboard(e):
         print("Dashboard clicked")
-        right_container.content.controls = [
-            create_dashboard(dashboard_data, user_info=user, page=page, db=db)
-        ]
-        right_container.update()
+        if navigate("dashboard"):
+            dashboard_refresher.trigger()
 
     def on_click_patients(e):
         print("Patients clicked")
-        right_container.content.controls = [
-            patients(db, page)
-        ]
-        right_container.update()
+        navigate("patients")
 
     def on_click_doctors(e):
         print("Doctors clicked")
-        
-        right_container.content.controls = [
-            doctors_and_nurses(db, page),
-        ]
-        right_container.update()
+        navigate("doctors")
+
+    def on_click_calendar(e):
+        print("Calendar clicked")
+        navigate("calendar")
 
     def on_click_chatbot(e):
         print("Chatbot clicked")
-        right_container.content.controls = [
-            chatbot_page(page)
-        ]
-        right_container.update()
+        navigate("chatbot")
     
     def on_click_profile_page(e):
         print("Profile Page clicked")
-        right_container.content.controls = [
-            profile_page(page, db)
-        ]
-        right_container.update()
+        navigate("profile")
 
     def logout(e):
-        os.remove("user_session.txt")
-        try:
-            if getattr(sys, 'frozen', False):
-                # Running as compiled executable
-                script_dir = os.path.dirname(sys.executable)
-            else:
-                # Running as script
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-                
-            main_path = os.path.join(script_dir, 'main.py')
-            subprocess.Popen([sys.executable, main_path])
-        except Exception as e:
-            print(f"Error launching main app: {e}")
-        page.window.close()
+        stop_background_work()
+        sessions.end(page.session_id, persist=not page.web)
+        page.on_disconnect = None
+        page.overlay.clear()
+        page.controls.clear()
+        if on_logout:
+            on_logout()
+        else:
+            show_login(page, db)
         
 
 
@@ -3849,16 +4618,39 @@ def main(page: Page):
 
     global right_container
     right_container = Container(
-        content=Column(
-            controls=[
-                create_dashboard(dashboard_data, user_info=user, page=page, db=db)
-            ],
-        ),
+        content=Column(),
         alignment=alignment.top_left,
         expand=True,
         width=page.width - 280,
     )
 
+    # Sidebar views are built on first visit and kept; the tables listed for each
+    # decide which change events mark it dirty
+    views = ViewManager(right_container)
+    views.register("dashboard", lambda: create_dashboard(dashboard_data, user_info=user, page=page, db=db),
+                   DASHBOARD_TABLES)
+    views.register("patients", lambda: patients(db, page), {"patients"})
+    views.register("doctors", lambda: doctors_and_nurses(db, page), {"users"})
+    views.register("calendar", lambda: calendar_view(db, page), {"appointments", "patients", "users"})
+    views.register("chatbot", lambda: chatbot_page(page))
+    views.register("profile", lambda: profile_page(page, db, user),
+                   {"users", "patients", "medical_records", "appointments", "prescriptions"})
+    views.show("dashboard", update=False)
+
+    notifier = ChangeNotifier(db)
+    notifier.subscribe(views.notify)
+    notifier.start()
+
+    # Keeps ward dashboards current even when nothing writes (e.g. "today" rolling over)
+    dashboard_refresher = DashboardRefresher(lambda: views.refresh("dashboard"))
+    dashboard_refresher.start()
+
+    def stop_background_work(e=None):
+        notifier.stop()
+        dashboard_refresher.stop()
+
+    page.on_disconnect = stop_background_work
+
     container = Container(
         content=Column(
             controls=[
@@ -3966,6 +4758,26 @@ def main(page: Page):
                                 bottom_right=20,
                             ),
                         ),
+                        Container(
+                            content=Row(
+                                controls=[
+                                    Icon(Icons.CALENDAR_MONTH, color=Colors.BLACK87),
+                                    Text("Calendar", weight=FontWeight.W_600),
+                                ],
+                            ),
+                            width=300,
+                            height=40,
+                            on_click=on_click_calendar,
+                            padding=padding.only(left=20, bottom=10),
+                            on_hover=on_hover_sidebar_button,
+                            margin=margin.all(10),
+                            border_radius=BorderRadius(
+                                top_left=20,
+                                bottom_left=20,
+                                top_right=20,
+                                bottom_right=20,
+                            ),
+                        ),
                         Container(
                             content=Row(
                                 controls=[
@@ -4075,6 +4887,7 @@ def main(page: Page):
     )
 
     page.add(main_container)
+    startup_profiler.mark("first dashboard paint")
 
 if __name__ == '__main__':
     app(target=main)
\ No newline at end of file
@@ -0,0 +1,229 @@
+import os
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+GEMINI_API_KEY = "YOUR_API_KEY"
+GEMINI_MODEL = "gemini-1.5-flash"
+
+# Set to "fake" to answer from FakeChatSession instead of Gemini (offline runs, UI testing)
+ASSISTANT_BACKEND_ENV = "MEDICARE_ASSISTANT_BACKEND"
+# Delay between chunks streamed by the fake backend (seconds)
+FAKE_CHUNK_DELAY = 0.03
+
+# Configured once on the model as its system instruction, so it is neither
+# repeated in every user turn nor stored in the chat history
+SYSTEM_INSTRUCTION = """\
+# Medical Check-up Assistant Prompt
+
+You are a Medical Check-up Assistant AI designed to support nurses and doctors during routine patient examinations and simple check-ups. Your role is to provide helpful information, reminders, and assistance with basic medical protocols to make routine appointments more efficient and thorough.
+
+## Primary Functions
+
+- **Vital Signs Guidance**: Provide normal ranges and interpretation assistance for temperature, blood pressure, pulse, respiratory rate, and oxygen saturation.
+
+- **Checklist Support**: Help track completion of routine check-up steps to ensure nothing is overlooked.
+
+- **Documentation Assistance**: Offer templates and suggestions for routine medical notes and patient instructions.
+
+- **Patient Information**: Help retrieve and organize basic patient information during consultations.
+
+- **Routine Questions**: Suggest standard screening questions appropriate for different patient demographics.
+
+## How to Respond
+
+When assisting medical staff during check-ups:
+
+1. **Be Concise**: Provide brief, clear responses that don't interrupt workflow.
+
+2. **Be Practical**: Focus on immediately useful information for routine visits.
+
+3. **Be Supportive**: Offer reminders and suggestions without being prescriptive.
+
+4. **Be Organized**: Present information in a structured, easy-to-scan format.
+
+5. **Be Respectful**: Recognize the medical staff's expertise and position as the primary care provider.
+
+## Example Scenarios
+
+### Scenario 1: Vital Sign Check
+**Staff**: "What's the normal blood pressure range for a 65-year-old patient?"
+
+**Assistant**: "Normal BP for 65-year-old adults: 
+- Ideal: Below 120/80 mmHg
+- Normal: Up to 129/84 mmHg
+- Elevated: 130-139/85-89 mmHg
+- High: 140/90 mmHg or higher
+
+Would you like age-specific considerations for this patient?"
+
+### Scenario 2: Routine Check-up Reminders
+**Staff**: "Help me with a standard adult check-up checklist."
+
+**Assistant**: "Standard Adult Check-up Checklist:
+- Vital signs (BP, pulse, temp, respiration)
+- Height and weight (calculate BMI)
+- Medical history review/updates
+- Medication review
+- Basic physical examination
+- Preventive screening questions
+- Age-appropriate screenings due
+- Immunization review
+- Lifestyle discussion (diet, exercise, sleep)
+- Any specific patient concerns
+
+Need any specific details for any of these items?"
+
+### Scenario 3: Simple Documentation
+**Staff**: "I need a template for normal findings in a routine physical."
+
+**Assistant**: "Basic Normal Findings Template:
+- General: Alert, oriented, no acute distress
+- Vital signs: Within normal limits
+- HEENT: Normocephalic, PERRLA, TMs intact, oropharynx clear
+- Neck: Supple, no lymphadenopathy, thyroid normal
+- Chest: Clear to auscultation bilaterally
+- Heart: RRR, no murmurs/gallops/rubs
+- Abdomen: Soft, non-tender, no organomegaly
+- Extremities: No edema, pulses intact
+- Skin: No rashes or lesions
+- Neuro: CN II-XII intact, normal gait
+
+Would you like me to expand any section?"
+
+## Limitations to Acknowledge
+
+- I do not diagnose conditions or interpret test results
+- I do not prescribe or recommend specific treatments
+- I cannot access patient records unless specifically shared
+- I am meant to assist with routine matters, not complex or emergency situations
+- I defer to the medical professional's judgment at all times
+
+I'm here to make routine check-ups more efficient by providing quick reference information and organizational support. How can I assist with today's patient appointments?
+"""
+
+# The Gemini SDK takes a noticeable part of startup to import, so it is only
+# loaded once the chatbot is opened
+_genai = None
+_model = None
+_lock = threading.Lock()
+
+
+def load_genai():
+    """Import and configure the Gemini SDK on first use"""
+    global _genai
+    with _lock:
+        if _genai is None:
+            import google.generativeai as genai
+            genai.configure(api_key=GEMINI_API_KEY)
+            _genai = genai
+        return _genai
+
+
+def get_model():
+    """The shared Gemini model, configured with the system instruction"""
+    global _model
+    genai = load_genai()
+    with _lock:
+        if _model is None:
+            _model = genai.GenerativeModel(GEMINI_MODEL, system_instruction=SYSTEM_INSTRUCTION)
+        return _model
+
+
+def use_fake_backend():
+    return os.environ.get(ASSISTANT_BACKEND_ENV, "").lower() == "fake"
+
+
+def start_chat(history=None):
+    """Start a chat session with Gemini, or with the fake backend if selected"""
+    if use_fake_backend():
+        return FakeChatSession(history)
+    return get_model().start_chat(history=history or [])
+
+
+def preload():
+    """Import the SDK in the background so the first chat doesn't wait on it"""
+    if use_fake_backend():
+        return
+    threading.Thread(target=load_genai, name="genai-preload", daemon=True).start()
+
+
+def log_usage(response):
+    """Print the token counts Gemini reports for one turn"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None
+    counts = {
+        "prompt": usage.prompt_token_count,
+        "response": usage.candidates_token_count,
+        "total": usage.total_token_count,
+    }
+    print(f"Gemini tokens: prompt={counts['prompt']} response={counts['response']} total={counts['total']}")
+    return counts
+
+
+def send_message(session, text):
+    """Send one user turn in a chat session and log its token usage"""
+    response = session.send_message(text)
+    log_usage(response)
+    return response
+
+
+def stream_message(session, text):
+    """
+    Send one user turn and yield the reply as it arrives, chunk by chunk.
+
+    Token usage is logged once the stream is exhausted.
+    """
+    response = session.send_message(text, stream=True)
+    for chunk in response:
+        try:
+            chunk_text = chunk.text
+        except ValueError:
+            # A chunk without text parts (e.g. only safety ratings)
+            continue
+        if chunk_text:
+            yield chunk_text
+    log_usage(response)
+
+
+class FakeResponse:
+    """Stands in for a Gemini response; iterating it streams the reply in chunks"""
+
+    def __init__(self, chunks, prompt_tokens, delay=FAKE_CHUNK_DELAY):
+        self.chunks = chunks
+        self.delay = delay
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=len(chunks),
+            total_token_count=prompt_tokens + len(chunks),
+        )
+
+    @property
+    def text(self):
+        return "".join(self.chunks)
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            time.sleep(self.delay)
+            yield SimpleNamespace(text=chunk)
+
+
+class FakeChatSession:
+    """Local chat backend with the same send_message interface as a Gemini chat session"""
+
+    def __init__(self, history=None):
+        self.history = list(history or [])
+
+    def send_message(self, text, stream=False):
+        reply = (
+            f"**Fake assistant** received: {text}\n\n"
+            "- This reply is streamed in word-sized chunks\n"
+            "- Set the backend back to Gemini for real answers"
+        )
+        self.history.append({"role": "user", "parts": [text]})
+        self.history.append({"role": "model", "parts": [reply]})
+        # Roughly one token per word of the whole conversation so far
+        prompt_tokens = sum(len(turn["parts"][0].split()) for turn in self.history[:-1])
+        return FakeResponse(re.findall(r"\S+\s*", reply), prompt_tokens, delay=FAKE_CHUNK_DELAY if stream else 0)
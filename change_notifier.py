@@ -0,0 +1,108 @@
+import threading
+
+from db_utils import HospitalDB
+
+# How often the notifier checks PRAGMA data_version (seconds)
+POLL_INTERVAL = 1.0
+# change_log entries older than this are pruned (seconds)
+CHANGE_LOG_RETENTION = 3600
+# Prune roughly once every this many polls
+PRUNE_EVERY = 600
+
+
+class ChangeNotifier:
+    """
+    Background watcher that tells listeners which tables changed in hospital.db.
+
+    Every process (login window, app windows, data_populate) writes through SQLite, and
+    triggers record each row change in change_log. PRAGMA data_version is a cheap
+    per-connection counter that moves whenever another connection commits, so the
+    change log is only read after a commit has actually happened.
+    """
+
+    def __init__(self, db: HospitalDB, interval=POLL_INTERVAL):
+        self.db = db
+        self.interval = interval
+        self.listeners = []
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.last_id = 0
+
+    def subscribe(self, callback, tables=None):
+        """
+        Call callback(changes) when any of tables change (all tables if None).
+
+        changes maps each changed table name to the set of changed row ids.
+        Returns a function that removes the subscription.
+        """
+        listener = (callback, set(tables) if tables else None)
+        with self.lock:
+            self.listeners.append(listener)
+
+        def unsubscribe():
+            with self.lock:
+                if listener in self.listeners:
+                    self.listeners.remove(listener)
+        return unsubscribe
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, name="change-notifier", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def run(self):
+        # Only changes committed after startup are reported
+        self.last_id = self.db.get_latest_change_id()
+        last_version = self.db.data_version()
+        polls = 0
+        while not self.stop_event.wait(self.interval):
+            polls += 1
+            if polls % PRUNE_EVERY == 0:
+                self.db.prune_change_log(CHANGE_LOG_RETENTION)
+
+            version = self.db.data_version()
+            if version is None or version == last_version:
+                continue
+            last_version = version
+            self.poll_changes()
+
+    def poll_changes(self):
+        """Read new change_log entries and dispatch them; returns the changes found"""
+        changes = {}
+        while True:
+            rows = self.db.get_changes_since(self.last_id)
+            if not rows:
+                break
+            for row in rows:
+                changes.setdefault(row["table_name"], set()).add(row["row_id"])
+            self.last_id = rows[-1]["id"]
+
+        if changes:
+            # Writes from other processes never went through this process's @invalidates
+            self.db.cache.invalidate(*changes)
+            for table in ("users", "patients"):
+                if table in changes:
+                    self.db.reindex_rows(table, list(changes[table]))
+            self.dispatch(changes)
+        return changes
+
+    def dispatch(self, changes):
+        with self.lock:
+            listeners = list(self.listeners)
+        for callback, tables in listeners:
+            if tables is None:
+                relevant = changes
+            else:
+                relevant = {table: rows for table, rows in changes.items() if table in tables}
+            if not relevant:
+                continue
+            try:
+                callback(relevant)
+            except Exception as e:
+                print(f"Error in change listener: {e}")
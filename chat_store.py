@@ -0,0 +1,209 @@
+import json
+import os
+import sqlite3
+import threading
+
+CHAT_DB_PATH = "chat.db"
+# Messages loaded at a time when a chat is opened or scrolled back
+CHAT_PAGE_SIZE = 50
+
+
+class ChatStore:
+    """
+    SQLite storage for chatbot conversations.
+
+    Each message is one INSERT in its own transaction, so appending costs the same
+    after months of history and a crash never leaves a half-written file behind.
+    Messages are read per chat through the (chat_id, ts) index.
+    """
+
+    def __init__(self, db_name=CHAT_DB_PATH):
+        self.db_name = db_name
+        self.local = threading.local()
+        self.create_tables()
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_name)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        self.local.conn = conn
+        self.local.cursor = conn.cursor()
+
+    def ensure_connection(self):
+        """Ensure that the current thread has a valid connection"""
+        if not hasattr(self.local, 'conn') or self.local.conn is None:
+            self.connect()
+        return self.local.conn, self.local.cursor
+
+    def rollback(self):
+        """Roll back the current thread's open transaction, if any"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None and conn.in_transaction:
+            conn.rollback()
+
+    def close(self):
+        if getattr(self.local, 'conn', None):
+            self.local.conn.close()
+            self.local.conn = None
+
+    def create_tables(self):
+        try:
+            conn, cursor = self.ensure_connection()
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS chats (
+                    id TEXT PRIMARY KEY,
+                    title TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chat_id TEXT NOT NULL REFERENCES chats(id) ON DELETE CASCADE,
+                    sender TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    ts TEXT NOT NULL
+                )
+            ''')
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_messages_chat_ts ON messages(chat_id, ts)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_chats_updated_at ON chats(updated_at)")
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error creating chat tables: {e}")
+
+    def migrate_json(self, file_path):
+        """
+        Import chats from the old chat.json into an empty store.
+
+        The JSON file is renamed to <file_path>.migrated afterwards so it is only
+        imported once. Returns the number of chats imported.
+        """
+        if not os.path.exists(file_path):
+            return 0
+        try:
+            conn, cursor = self.ensure_connection()
+            cursor.execute("SELECT 1 FROM chats LIMIT 1")
+            if cursor.fetchone():
+                return 0
+            with open(file_path, 'r') as file:
+                chats = json.load(file).get("chats", [])
+
+            cursor.execute("BEGIN")
+            for chat in chats:
+                cursor.execute(
+                    "INSERT OR IGNORE INTO chats (id, title, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                    (chat["id"], chat["title"], chat["created_at"], chat["updated_at"])
+                )
+                cursor.executemany(
+                    "INSERT INTO messages (chat_id, sender, message, ts) VALUES (?, ?, ?, ?)",
+                    [(chat["id"], m["sender"], m["message"], m["timestamp"]) for m in chat.get("messages", [])]
+                )
+            conn.commit()
+            os.replace(file_path, file_path + ".migrated")
+            return len(chats)
+        except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+            self.rollback()
+            print(f"Error migrating chats from {file_path}: {e}")
+            return 0
+
+    def list_chats(self):
+        """Chat metadata (id, title, created_at, updated_at, message_count), most recently updated first"""
+        try:
+            conn, cursor = self.ensure_connection()
+            # The count is answered from idx_messages_chat_ts without reading message text
+            cursor.execute('''
+                SELECT c.id, c.title, c.created_at, c.updated_at,
+                       (SELECT COUNT(*) FROM messages m WHERE m.chat_id = c.id) AS message_count
+                FROM chats c
+                ORDER BY c.updated_at DESC
+            ''')
+            return [dict(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error listing chats: {e}")
+            return []
+
+    def get_messages(self, chat_id, before=None, limit=None):
+        """
+        Messages of a chat, oldest first.
+
+        Args:
+            chat_id (str): Chat to read
+            before (tuple): (timestamp, id) of a message; only older messages are returned
+            limit (int): Return only the newest `limit` matching messages
+
+        Returns:
+            list: Message dicts with id, sender, message and timestamp
+        """
+        try:
+            conn, cursor = self.ensure_connection()
+            query = "SELECT id, sender, message, ts AS timestamp FROM messages WHERE chat_id = ?"
+            params = [chat_id]
+            if before is not None:
+                query += " AND (ts, id) < (?, ?)"
+                params.extend(before)
+            # Newest first so LIMIT keeps the latest page, then flipped back to oldest first
+            query += " ORDER BY ts DESC, id DESC"
+            if limit is not None:
+                query += " LIMIT ?"
+                params.append(limit)
+            cursor.execute(query, params)
+            return [dict(row) for row in reversed(cursor.fetchall())]
+        except sqlite3.Error as e:
+            print(f"Error getting chat messages: {e}")
+            return []
+
+    def create_chat(self, chat_id, title, created_at):
+        try:
+            conn, cursor = self.ensure_connection()
+            cursor.execute(
+                "INSERT INTO chats (id, title, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                (chat_id, title, created_at, created_at)
+            )
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"Error creating chat: {e}")
+            return False
+
+    def add_message(self, chat_id, sender, message, ts, title=None):
+        """Append a message and bump the chat's updated_at (and title, if given) atomically"""
+        try:
+            conn, cursor = self.ensure_connection()
+            cursor.execute(
+                "INSERT INTO messages (chat_id, sender, message, ts) VALUES (?, ?, ?, ?)",
+                (chat_id, sender, message, ts)
+            )
+            cursor.execute(
+                "UPDATE chats SET updated_at = ?, title = COALESCE(?, title) WHERE id = ?",
+                (ts, title, chat_id)
+            )
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            self.rollback()
+            print(f"Error adding chat message: {e}")
+            return False
+
+    def update_title(self, chat_id, title):
+        try:
+            conn, cursor = self.ensure_connection()
+            cursor.execute("UPDATE chats SET title = ? WHERE id = ?", (title, chat_id))
+            conn.commit()
+            return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            print(f"Error updating chat title: {e}")
+            return False
+
+    def delete_chat(self, chat_id):
+        """Delete a chat and, through the foreign key, its messages"""
+        try:
+            conn, cursor = self.ensure_connection()
+            cursor.execute("DELETE FROM chats WHERE id = ?", (chat_id,))
+            conn.commit()
+            return cursor.rowcount > 0
+        except sqlite3.Error as e:
+            print(f"Error deleting chat: {e}")
+            return False
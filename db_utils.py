@@ -1,6 +1,257 @@
+import json
+import os
 import sqlite3
 import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
 from datetime import datetime, timedelta
+from enum import Enum
+from functools import wraps
+
+from search_index import SearchIndex
+
+# Appointment scheduling settings (minutes)
+DEFAULT_APPOINTMENT_MINUTES = 30
+# Upper bound on a single appointment; keeps the per-doctor overlap lookup to a short index range
+MAX_APPOINTMENT_MINUTES = 240
+APPOINTMENT_TS_FORMAT = "%Y-%m-%d %H:%M"
+
+# Availability: each doctor/day is a bitmap of 5-minute slots (bit 0 = 00:00-00:05)
+OCCUPANCY_SLOT_MINUTES = 5
+OCCUPANCY_SLOTS_PER_DAY = 24 * 60 // OCCUPANCY_SLOT_MINUTES
+OCCUPANCY_BYTES = OCCUPANCY_SLOTS_PER_DAY // 8
+# Working hours used for doctors without rows in doctor_working_hours (Mon-Fri)
+DEFAULT_WORKING_HOURS = {weekday: ("09:00", "17:00") for weekday in range(5)}
+
+# Revenue rollups: dimensions that can be grouped on, and placeholders for missing values
+ROLLUP_DIMENSIONS = ("payment_status", "payment_method", "department")
+UNSPECIFIED_METHOD = "unspecified"
+UNASSIGNED_DEPARTMENT = "Unassigned"
+
+# Accounts-receivable aging
+DEFAULT_PAYER = "Self-pay"
+AR_AGING_BUCKETS = ("days_0_30", "days_31_60", "days_61_90", "days_90_plus")
+
+# Patient timeline page size (records, prescriptions and bills combined)
+TIMELINE_PAGE_SIZE = 50
+
+# Patient grid page size (a multiple of the grid's 3 columns)
+PATIENT_PAGE_SIZE = 30
+
+# Rows per section on the doctor profile page
+PROFILE_PAGE_SIZE = 20
+# Matches returned to the type-ahead pickers in forms
+SEARCH_RESULT_LIMIT = 10
+
+# Read cache for hot lookups (shared by every HospitalDB on the same file)
+CACHE_MAX_ENTRIES = 256
+CACHE_TTL_SECONDS = 30
+
+# Type-ahead search: indexed fields and their ranking weight, per table
+SEARCH_INDEX_FIELDS = {
+    "users": {"name": 3, "specialization": 2, "role": 1, "email": 1},
+    "patients": {"name": 3, "email": 1, "phone": 1},
+}
+
+# Tables whose row changes are recorded in change_log for other processes to pick up
+CHANGE_TRACKED_TABLES = ("users", "patients", "medical_records", "appointments", "prescriptions", "billing")
+
+
+class Role(str, Enum):
+    """User roles, stored lower-case in users.role"""
+    DOCTOR = "doctor"
+    NURSE = "nurse"
+    ADMIN = "admin"
+
+    @classmethod
+    def parse(cls, value):
+        """Role for a stored or user-entered value in any case, or None if unknown"""
+        try:
+            return cls(normalize_code(value))
+        except ValueError:
+            return None
+
+    @property
+    def label(self):
+        return self.value.title()
+
+
+class UserStatus(str, Enum):
+    """Account status, stored lower-case in users.status"""
+    ACTIVE = "active"
+    INACTIVE = "inactive"
+
+
+class AppointmentConflict(Exception):
+    """Raised by add_appointment(on_conflict="raise"); the message says which booking is in the way"""
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        first = conflicts[0]
+        super().__init__(f"The doctor is already booked from {first['start_at']} to {first['end_at']}.")
+
+
+def normalize_code(value):
+    """Stored form of a role or status: the enum value, or the text lower-cased"""
+    if isinstance(value, Enum):
+        value = value.value
+    return str(value).strip().lower()
+
+
+def minutes_since_midnight(time_str):
+    """Convert an "HH:MM" string to minutes since midnight"""
+    hours, minutes = time_str[:5].split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def slot_mask(start_minute, end_minute):
+    """Bitmap covering every 5-minute slot touched by [start_minute, end_minute)"""
+    first = max(start_minute, 0) // OCCUPANCY_SLOT_MINUTES
+    last = min(-(-end_minute // OCCUPANCY_SLOT_MINUTES), OCCUPANCY_SLOTS_PER_DAY)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def appointment_interval(appointment_date, appointment_time, duration=DEFAULT_APPOINTMENT_MINUTES):
+    """Return the (start_at, end_at) strings for an appointment slot"""
+    start = datetime.strptime(f"{appointment_date} {appointment_time[:5]}", APPOINTMENT_TS_FORMAT)
+    end = start + timedelta(minutes=duration)
+    return start.strftime(APPOINTMENT_TS_FORMAT), end.strftime(APPOINTMENT_TS_FORMAT)
+
+
+def _copy_result(value):
+    """Copy a cached row or row list so callers can mutate what they get back"""
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, list):
+        return [dict(row) if isinstance(row, dict) else row for row in value]
+    return value
+
+
+def _freeze(value):
+    """Hashable form of a call argument, for use in cache keys"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+class QueryCache:
+    """
+    LRU cache with TTL expiry for HospitalDB reads.
+
+    Every entry remembers the generation of each table it was read from. Writers
+    bump those generations, so an entry read before a write is never served after it.
+    """
+
+    _shared = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.generations = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def for_database(cls, db_name):
+        """Get the cache shared by all connections to db_name"""
+        key = os.path.abspath(db_name)
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls()
+            return cls._shared[key]
+
+    def snapshot(self, tables):
+        """Current generations of tables, taken before a read"""
+        with self.lock:
+            return tuple(self.generations.get(table, 0) for table in tables)
+
+    def get(self, key, tables):
+        """Return (True, value) for a live entry, else (False, None)"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, expires_at, generations = entry
+                current = tuple(self.generations.get(table, 0) for table in tables)
+                if expires_at > time.monotonic() and generations == current:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return True, _copy_result(value)
+                del self.entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, value, generations):
+        """Store a value read under the given table generations"""
+        with self.lock:
+            self.entries[key] = (_copy_result(value), time.monotonic() + self.ttl, generations)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *tables):
+        """Bump the generation of each table so entries read from it go stale"""
+        with self.lock:
+            for table in tables:
+                self.generations[table] = self.generations.get(table, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self.entries),
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+def cached_read(*tables):
+    """Serve a HospitalDB read from the query cache; empty results are not cached"""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            key = (method.__name__, _freeze(args), _freeze(kwargs))
+            hit, value = self.cache.get(key, tables)
+            if hit:
+                return value
+            generations = self.cache.snapshot(tables)
+            value = method(self, *args, **kwargs)
+            if value:
+                self.cache.put(key, value, generations)
+            return value
+        return wrapper
+    return decorator
+
+
+def invalidates(*tables):
+    """Mark a HospitalDB method as writing to tables, expiring cached reads of them"""
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                self.cache.invalidate(*tables)
+        return wrapper
+    return decorator
+
 
 class HospitalDB:
     def __init__(self, db_name="hospital.db"):
@@ -8,9 +259,10 @@ class HospitalDB:
         self.db_name = db_name
         # Use thread-local storage to store connections
         self.local = threading.local()
+        self.cache = QueryCache.for_database(db_name)
         # Create initial connection in the current thread
         self.connect()
-        self.create_tables()
+        self.prepare_database()
 
     def connect(self):
         """Connect to the SQLite database in the current thread"""
@@ -35,8 +287,102 @@ class HospitalDB:
             self.connect()
         return self.local.conn, self.local.cursor
 
+    _search_indexes = {}
+    _search_indexes_lock = threading.Lock()
+
+    def search_index(self, table):
+        """
+        Shared type-ahead index over users or patients, built on first use.
+
+        Kept current by reindex_rows, which the user/patient writers call and
+        ChangeNotifier calls for changes made by other processes.
+        """
+        key = (os.path.abspath(self.db_name), table)
+        with self._search_indexes_lock:
+            index = self._search_indexes.get(key)
+            if index is not None:
+                return index
+            index = SearchIndex(SEARCH_INDEX_FIELDS[table])
+            for row in self._search_rows(table):
+                index.add(row["id"], row)
+            self._search_indexes[key] = index
+            return index
+
+    def _search_rows(self, table, row_ids=None):
+        """Rows that belong in the search index for table (active patients only)"""
+        try:
+            conn, cursor = self.ensure_connection()
+            query = f"SELECT id, {', '.join(SEARCH_INDEX_FIELDS[table])} FROM {table} WHERE 1=1"
+            params = []
+            if table == "patients":
+                query += " AND status = 'active'"
+            if row_ids is not None:
+                query += f" AND id IN ({', '.join('?' for _ in row_ids)})"
+                params.extend(row_ids)
+            cursor.execute(query, params)
+            return [dict(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error loading {table} for search: {e}")
+            return []
+
+    def reindex_rows(self, table, row_ids):
+        """Refresh the given rows in table's search index, if it has been built"""
+        index = self._search_indexes.get((os.path.abspath(self.db_name), table))
+        row_ids = [row_id for row_id in row_ids if row_id is not None]
+        if index is None or not row_ids:
+            return
+        for i in range(0, len(row_ids), 500):
+            chunk = row_ids[i:i + 500]
+            rows = {row["id"]: row for row in self._search_rows(table, chunk)}
+            for row_id in chunk:
+                if row_id in rows:
+                    index.add(row_id, rows[row_id])
+                else:
+                    index.remove(row_id)
+
+    def cache_stats(self):
+        """Hit/miss counters for the shared read cache"""
+        return self.cache.stats()
+
+    def begin_immediate(self, conn):
+        """Start a write transaction right away so checks and writes inside it are atomic"""
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+
+    def rollback(self):
+        """Roll back any open transaction on the current thread's connection"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None and conn.in_transaction:
+            conn.rollback()
+
+    _prepared_databases = set()
+    _prepared_databases_lock = threading.Lock()
+
+    def prepare_database(self):
+        """
+        Run create_tables once per database file per process.
+
+        The pass also backfills and normalizes rows in full-table UPDATEs, so
+        further instances opened on the same file skip it.
+        """
+        key = os.path.abspath(self.db_name)
+        with self._prepared_databases_lock:
+            if key in self._prepared_databases:
+                return
+            if self.create_tables():
+                self._prepared_databases.add(key)
+
+    def add_missing_columns(self, cursor, table, columns):
+        """Add columns introduced after a table was first created"""
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row["name"] for row in cursor.fetchall()}
+        for name, definition in columns:
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
     def create_tables(self):
-        """Create all necessary tables if they don't exist"""
+        """Create all necessary tables if they don't exist; returns True on success"""
         try:
             conn, cursor = self.ensure_connection()
             
@@ -56,6 +402,17 @@ class HospitalDB:
                 )
             ''')
 
+            # Roles and statuses are compared case-insensitively; older rows were written as
+            # "Doctor"/"doctor" alike, so normalize them once and index the NOCASE form
+            cursor.execute('''
+                UPDATE users SET role = lower(trim(role)), status = lower(trim(status))
+                WHERE role != lower(trim(role)) OR status != lower(trim(status))
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_users_role_status
+                ON users (role COLLATE NOCASE, status COLLATE NOCASE)
+            ''')
+
             # Patients table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS patients (
@@ -72,6 +429,9 @@ class HospitalDB:
                 )
             ''')
 
+            # Active patients in id order, for the paginated patient grid
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_patients_status ON patients (status, id)")
+
             # Medical records table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS medical_records (
@@ -87,6 +447,20 @@ class HospitalDB:
                 )
             ''')
 
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_medical_records_patient
+                ON medical_records (patient_id, record_date)
+            ''')
+            # Doctor profile: distinct patients in id order, and records newest first
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_medical_records_doctor_patient
+                ON medical_records (doctor_id, patient_id)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_medical_records_doctor_date
+                ON medical_records (doctor_id, record_date)
+            ''')
+
             # Appointments table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS appointments (
@@ -97,11 +471,76 @@ class HospitalDB:
                     appointment_time TEXT NOT NULL,
                     reason TEXT,
                     status TEXT DEFAULT 'scheduled',
+                    duration INTEGER DEFAULT 30,
+                    start_at TEXT,
+                    end_at TEXT,
+                    conflict_flag INTEGER DEFAULT 0,
                     FOREIGN KEY (patient_id) REFERENCES patients (id),
                     FOREIGN KEY (doctor_id) REFERENCES users (id)
                 )
             ''')
 
+            # Scheduling columns for databases created before conflict detection
+            self.add_missing_columns(cursor, "appointments", [
+                ("duration", "INTEGER DEFAULT 30"),
+                ("start_at", "TEXT"),
+                ("end_at", "TEXT"),
+                ("conflict_flag", "INTEGER DEFAULT 0"),
+            ])
+
+            # Backfill intervals for rows inserted without them (old rows, data_populate.py)
+            cursor.execute('''
+                UPDATE appointments
+                SET start_at = appointment_date || ' ' || substr(appointment_time, 1, 5),
+                    end_at = strftime('%Y-%m-%d %H:%M', appointment_date || ' ' || substr(appointment_time, 1, 5),
+                                      '+' || COALESCE(duration, 30) || ' minutes')
+                WHERE start_at IS NULL
+            ''')
+            backfilled_appointments = cursor.rowcount
+
+            # Per-doctor interval index used by the overlap check
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_appointments_doctor_interval
+                ON appointments (doctor_id, start_at, end_at)
+            ''')
+
+            # Covering index for calendar range reads: per-doctor day/time order, plus the
+            # status and patient columns so filtering and joining never touch the table rows
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_appointments_calendar
+                ON appointments (doctor_id, appointment_date, appointment_time, status, patient_id)
+            ''')
+            # Same for whole-hospital views that don't filter by doctor
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_appointments_date
+                ON appointments (appointment_date, appointment_time, status, patient_id, doctor_id)
+            ''')
+
+            # Weekly working hours per doctor (weekday 0 = Monday)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS doctor_working_hours (
+                    doctor_id INTEGER NOT NULL,
+                    weekday INTEGER NOT NULL,
+                    start_time TEXT NOT NULL,
+                    end_time TEXT NOT NULL,
+                    PRIMARY KEY (doctor_id, weekday),
+                    FOREIGN KEY (doctor_id) REFERENCES users (id)
+                )
+            ''')
+
+            # Precomputed per-day occupancy bitmaps, kept in step with appointments
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS doctor_day_occupancy (
+                    doctor_id INTEGER NOT NULL,
+                    day TEXT NOT NULL,
+                    bitmap BLOB NOT NULL,
+                    PRIMARY KEY (doctor_id, day)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute("SELECT COUNT(*) AS count FROM doctor_day_occupancy")
+            if backfilled_appointments or cursor.fetchone()["count"] == 0:
+                self._rebuild_occupancy(cursor)
+
             # Prescriptions table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS prescriptions (
@@ -116,6 +555,8 @@ class HospitalDB:
                 )
             ''')
 
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_prescriptions_record ON prescriptions (record_id)")
+
             # Billing table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS billing (
@@ -126,32 +567,161 @@ class HospitalDB:
                     payment_status TEXT DEFAULT 'pending',
                     payment_date TEXT,
                     payment_method TEXT,
+                    bill_date TEXT,
+                    department TEXT,
                     FOREIGN KEY (patient_id) REFERENCES patients (id),
                     FOREIGN KEY (record_id) REFERENCES medical_records (id)
                 )
             ''')
 
+            # Billing date and department snapshot, needed to keep revenue rollups in step
+            self.add_missing_columns(cursor, "billing", [
+                ("bill_date", "TEXT"),
+                ("department", "TEXT"),
+            ])
+            cursor.execute(f'''
+                UPDATE billing
+                SET bill_date = COALESCE(
+                        payment_date,
+                        (SELECT record_date FROM medical_records WHERE id = billing.record_id),
+                        strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime')
+                    ),
+                    department = COALESCE(
+                        (SELECT u.specialization FROM medical_records mr
+                         JOIN users u ON mr.doctor_id = u.id
+                         WHERE mr.id = billing.record_id),
+                        '{UNASSIGNED_DEPARTMENT}'
+                    )
+                WHERE bill_date IS NULL
+            ''')
+            backfilled_bills = cursor.rowcount
+
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_billing_patient ON billing (patient_id, bill_date)")
+
+            # Payer and change tracking for the AR aging report
+            self.add_missing_columns(cursor, "billing", [
+                ("payer", f"TEXT DEFAULT '{DEFAULT_PAYER}'"),
+                ("updated_at", "TEXT"),
+            ])
+            cursor.execute(f'''
+                UPDATE billing
+                SET payer = COALESCE(payer, CASE WHEN payment_method = 'Insurance' THEN 'Insurance'
+                                                 ELSE '{DEFAULT_PAYER}' END),
+                    updated_at = strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime')
+                WHERE updated_at IS NULL
+            ''')
+            # Covering index for the aging pass: outstanding bills in (patient, payer) order
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_billing_outstanding
+                ON billing (payment_status, patient_id, payer, bill_date, amount)
+            ''')
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_billing_updated_at ON billing (updated_at)")
+            # Writers that don't set updated_at (older scripts, data_populate, manual fixes) would
+            # be invisible to the incremental aging refresh, so stamp those rows here: inserts
+            # that leave it NULL and updates that leave it unchanged
+            for old_trigger in ("trg_billing_insert_updated_at", "trg_billing_update_updated_at"):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {old_trigger}")
+            for operation, condition in (("INSERT", "NEW.updated_at IS NULL"),
+                                         ("UPDATE", "NEW.updated_at IS OLD.updated_at")):
+                cursor.execute(f'''
+                    CREATE TRIGGER IF NOT EXISTS trg_billing_{operation.lower()}_stamp
+                    AFTER {operation} ON billing
+                    WHEN {condition}
+                    BEGIN
+                        UPDATE billing SET updated_at = strftime('%Y-%m-%d %H:%M:%S', 'now', 'localtime')
+                        WHERE id = NEW.id;
+                    END
+                ''')
+
+            # Materialized aging buckets per patient and payer, plus the refresh watermark
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS ar_aging (
+                    patient_id INTEGER NOT NULL,
+                    payer TEXT NOT NULL,
+                    days_0_30 REAL NOT NULL DEFAULT 0,
+                    days_31_60 REAL NOT NULL DEFAULT 0,
+                    days_61_90 REAL NOT NULL DEFAULT 0,
+                    days_90_plus REAL NOT NULL DEFAULT 0,
+                    total_outstanding REAL NOT NULL DEFAULT 0,
+                    bill_count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (patient_id, payer)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS ar_aging_state (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    as_of TEXT NOT NULL,
+                    watermark TEXT
+                )
+            ''')
+
+            # Daily and monthly revenue aggregates, maintained by add_bill and update_payment
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS revenue_rollups (
+                    period TEXT NOT NULL,
+                    bucket TEXT NOT NULL,
+                    payment_status TEXT NOT NULL,
+                    payment_method TEXT NOT NULL,
+                    department TEXT NOT NULL,
+                    bill_count INTEGER NOT NULL DEFAULT 0,
+                    total_amount REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (period, bucket, payment_status, payment_method, department)
+                ) WITHOUT ROWID
+            ''')
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM revenue_rollups) AS has_rollups")
+            if backfilled_bills or not cursor.fetchone()["has_rollups"]:
+                self._rebuild_revenue_rollups(cursor)
+
+            # Per-row change log written by triggers, read by ChangeNotifier
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS change_log (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    table_name TEXT NOT NULL,
+                    row_id INTEGER,
+                    operation TEXT NOT NULL,
+                    changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%S', 'now'))
+                )
+            ''')
+            for table in CHANGE_TRACKED_TABLES:
+                for operation, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+                    cursor.execute(f'''
+                        CREATE TRIGGER IF NOT EXISTS trg_{table}_{operation.lower()}_log
+                        AFTER {operation} ON {table}
+                        BEGIN
+                            INSERT INTO change_log (table_name, row_id, operation)
+                            VALUES ('{table}', {row}.id, '{operation.lower()}');
+                        END
+                    ''')
+
             conn.commit()
             print("Tables created successfully")
+            return True
         except sqlite3.Error as e:
+            self.rollback()
             print(f"Error creating tables: {e}")
+            return False
 
     # User management functions
+    @invalidates("users")
     def add_user(self, name, email, password, role, specialization=None, phone=None, address=None):
         """Add a new user (doctor, nurse, staff) to the database"""
         try:
             conn, cursor = self.ensure_connection()
             date_joined = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            role = normalize_code(role)
             cursor.execute('''
                 INSERT INTO users (name, email, password, role, specialization, phone, address, date_joined)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             ''', (name, email, password, role, specialization, phone, address, date_joined))
             conn.commit()
-            return cursor.lastrowid
+            user_id = cursor.lastrowid
+            self.reindex_rows("users", [user_id])
+            return user_id
         except sqlite3.Error as e:
             print(f"Error adding user: {e}")
             return None
 
+    @cached_read("users")
     def get_user(self, user_id=None, email=None):
         """Get user details by ID or email"""
         try:
@@ -168,12 +738,13 @@ class HospitalDB:
             print(f"Error getting user: {e}")
             return None
 
+    @cached_read("users")
     def get_all_users(self, role=None):
         """Get all users or filter by role"""
         try:
             conn, cursor = self.ensure_connection()
             if role:
-                cursor.execute("SELECT * FROM users WHERE role = ?", (role,))
+                cursor.execute("SELECT * FROM users WHERE role = ? COLLATE NOCASE", (normalize_code(role),))
             else:
                 cursor.execute("SELECT * FROM users")
             return [dict(row) for row in cursor.fetchall()]
@@ -181,12 +752,63 @@ class HospitalDB:
             print(f"Error getting users: {e}")
             return []
 
+    @cached_read("users")
+    def get_specializations(self):
+        """Distinct doctor specializations, sorted"""
+        try:
+            conn, cursor = self.ensure_connection()
+            cursor.execute('''
+                SELECT DISTINCT specialization FROM users
+                WHERE role = 'doctor' COLLATE NOCASE AND specialization IS NOT NULL AND specialization != ''
+                ORDER BY specialization
+            ''')
+            return [row["specialization"] for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error getting specializations: {e}")
+            return []
+
+    @cached_read("users")
+    def get_staff(self, roles=(Role.DOCTOR, Role.NURSE), status=None):
+        """
+        Get users in any of the given roles with one indexed query.
+
+        Args:
+            roles (iterable): Role members or role names in any case
+            status (UserStatus): Only return users with this status (default all)
+
+        Returns:
+            list: User dicts with "role" normalized to lower case, ordered by role then name
+        """
+        try:
+            conn, cursor = self.ensure_connection()
+            roles = [normalize_code(role) for role in roles]
+            if not roles:
+                return []
+            query = f"SELECT * FROM users WHERE role COLLATE NOCASE IN ({', '.join('?' for _ in roles)})"
+            params = list(roles)
+            if status:
+                query += " AND status = ? COLLATE NOCASE"
+                params.append(normalize_code(status))
+            query += " ORDER BY role COLLATE NOCASE, name"
+            cursor.execute(query, params)
+            staff = [dict(row) for row in cursor.fetchall()]
+            for user in staff:
+                user["role"] = user["role"].lower()
+            return staff
+        except sqlite3.Error as e:
+            print(f"Error getting staff: {e}")
+            return []
+
+    @invalidates("users")
     def update_user(self, user_id, **kwargs):
         """Update user details"""
         try:
             conn, cursor = self.ensure_connection()
             valid_fields = ["name", "email", "password", "role", "specialization", "phone", "address", "status"]
             updates = {k: v for k, v in kwargs.items() if k in valid_fields and v is not None}
+            for field in ("role", "status"):
+                if field in updates:
+                    updates[field] = normalize_code(updates[field])
             
             if not updates:
                 return False
@@ -197,11 +819,14 @@ class HospitalDB:
 
             cursor.execute(f"UPDATE users SET {set_clause} WHERE id = ?", values)
             conn.commit()
-            return cursor.rowcount > 0
+            updated = cursor.rowcount > 0
+            self.reindex_rows("users", [user_id])
+            return updated
         except sqlite3.Error as e:
             print(f"Error updating user: {e}")
             return False
 
+    @invalidates("users")
     def delete_user(self, user_id):
         """Delete a user (or set status to inactive)"""
         try:
@@ -209,12 +834,64 @@ class HospitalDB:
             # Soft delete by setting status to 'inactive'
             cursor.execute("UPDATE users SET status = 'inactive' WHERE id = ?", (user_id,))
             conn.commit()
-            return cursor.rowcount > 0
+            updated = cursor.rowcount > 0
+            self.reindex_rows("users", [user_id])
+            return updated
         except sqlite3.Error as e:
             print(f"Error deleting user: {e}")
             return False
 
+    def data_version(self):
+        """PRAGMA data_version for this thread's connection; changes when another connection commits"""
+        try:
+            conn, cursor = self.ensure_connection()
+            cursor.execute("PRAGMA data_version")
+            return cursor.fetchone()[0]
+        except sqlite3.Error as e:
+            print(f"Error reading data version: {e}")
+            return None
+
+    def get_latest_change_id(self):
+        """Highest change_log id, or 0 if the log is empty"""
+        try:
+            conn, cursor = self.ensure_connection()
+            cursor.execute("SELECT COALESCE(MAX(id), 0) AS last_id FROM change_log")
+            return cursor.fetchone()["last_id"]
+        except sqlite3.Error as e:
+            print(f"Error getting latest change: {e}")
+            return 0
+
+    def get_changes_since(self, last_id, limit=1000):
+        """Get change_log entries after last_id, oldest first"""
+        try:
+            conn, cursor = self.ensure_connection()
+            cursor.execute('''
+                SELECT id, table_name, row_id, operation FROM change_log
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+            ''', (last_id, limit))
+            return [dict(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error getting changes: {e}")
+            return []
+
+    def prune_change_log(self, max_age_seconds=3600):
+        """Drop change_log entries old enough that every listener has seen them"""
+        try:
+            conn, cursor = self.ensure_connection()
+            cursor.execute(
+                "DELETE FROM change_log WHERE changed_at < strftime('%Y-%m-%d %H:%M:%S', 'now', ?)",
+                (f"-{int(max_age_seconds)} seconds",)
+            )
+            conn.commit()
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            print(f"Error pruning change log: {e}")
+            return 0
+
     # Patient management functions
+    @invalidates("patients")
     def add_patient(self, name, email=None, phone=None, address=None, date_of_birth=None, gender=None, blood_group=None):
         """Add a new patient to the database"""
         try:
@@ -225,11 +902,14 @@ class HospitalDB:
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             ''', (name, email, phone, address, date_of_birth, gender, blood_group, registration_date))
             conn.commit()
-            return cursor.lastrowid
+            patient_id = cursor.lastrowid
+            self.reindex_rows("patients", [patient_id])
+            return patient_id
         except sqlite3.Error as e:
             print(f"Error adding patient: {e}")
             return None
 
+    @cached_read("patients")
     def get_patient(self, patient_id):
         """Get patient details by ID"""
         try:
@@ -241,6 +921,92 @@ class HospitalDB:
             print(f"Error getting patient: {e}")
             return None
 
+    def get_patient_timeline(self, patient_id, limit=TIMELINE_PAGE_SIZE, before=None):
+        """
+        Get a patient's profile and history (records, prescriptions, bills) in one snapshot read.
+
+        Events are merged newest first and paginated with a keyset cursor, so each page
+        costs the same regardless of how long the history is.
+
+        Args:
+            patient_id (int): Patient ID
+            limit (int): Maximum number of events to return
+            before (tuple): Cursor from a previous page's "next_before" to continue from
+
+        Returns:
+            dict: {"patient": dict, "events": list, "next_before": tuple or None},
+                  or None if the patient does not exist
+        """
+        try:
+            conn, cursor = self.ensure_connection()
+            if conn.in_transaction:
+                conn.commit()
+            # Profile and events come from the same snapshot
+            cursor.execute("BEGIN")
+            cursor.execute("SELECT * FROM patients WHERE id = ?", (patient_id,))
+            patient = cursor.fetchone()
+            if not patient:
+                conn.commit()
+                return None
+
+            # Rows past the cursor in (ts, kind, id) order; 'bill' > 'prescription' > 'record'
+            # breaks ties between events sharing a timestamp. Undated events get ts '' rather
+            # than NULL, which the row-value comparison would drop
+            before_clause = "WHERE (ts, kind, id) < (:ts, :kind, :id)" if before else ""
+            cursor.execute(f'''
+                SELECT kind, id, ts, payload FROM (
+                    SELECT 'record' AS kind, mr.id, COALESCE(mr.record_date, '') AS ts,
+                           json_object('diagnosis', mr.diagnosis, 'treatment', mr.treatment,
+                                       'notes', mr.notes, 'record_date', mr.record_date,
+                                       'doctor_id', mr.doctor_id, 'doctor_name', u.name) AS payload
+                    FROM medical_records mr
+                    LEFT JOIN users u ON mr.doctor_id = u.id
+                    WHERE mr.patient_id = :patient_id
+                    UNION ALL
+                    SELECT 'prescription', p.id, COALESCE(mr.record_date, ''),
+                           json_object('medication', p.medication, 'dosage', p.dosage,
+                                       'frequency', p.frequency, 'duration', p.duration,
+                                       'notes', p.notes, 'record_id', p.record_id,
+                                       'diagnosis', mr.diagnosis, 'record_date', mr.record_date)
+                    FROM medical_records mr
+                    JOIN prescriptions p ON p.record_id = mr.id
+                    WHERE mr.patient_id = :patient_id
+                    UNION ALL
+                    SELECT 'bill', b.id, COALESCE(b.bill_date, b.payment_date, ''),
+                           json_object('amount', b.amount, 'payment_status', b.payment_status,
+                                       'payment_date', b.payment_date, 'payment_method', b.payment_method,
+                                       'bill_date', b.bill_date, 'record_id', b.record_id, 'payer', b.payer)
+                    FROM billing b
+                    WHERE b.patient_id = :patient_id
+                )
+                {before_clause}
+                ORDER BY ts DESC, kind DESC, id DESC
+                LIMIT :limit
+            ''', {
+                "patient_id": patient_id,
+                "limit": limit + 1,
+                "ts": before[0] if before else None,
+                "kind": before[1] if before else None,
+                "id": before[2] if before else None,
+            })
+            rows = cursor.fetchall()
+            conn.commit()
+
+            events = []
+            for row in rows[:limit]:
+                event = json.loads(row["payload"])
+                event.update(kind=row["kind"], id=row["id"], timestamp=row["ts"])
+                events.append(event)
+            next_before = None
+            if len(rows) > limit:
+                last = rows[limit - 1]
+                next_before = (last["ts"], last["kind"], last["id"])
+            return {"patient": dict(patient), "events": events, "next_before": next_before}
+        except sqlite3.Error as e:
+            self.rollback()
+            print(f"Error getting patient timeline: {e}")
+            return None
+
     def get_all_patients(self):
         """Get all patients"""
         try:
@@ -251,6 +1017,57 @@ class HospitalDB:
             print(f"Error getting patients: {e}")
             return []
 
+    def get_patients_page(self, after_id=None, before_id=None, limit=PATIENT_PAGE_SIZE):
+        """
+        Get one page of active patients in id order using keyset pagination.
+
+        Args:
+            after_id (int): Return patients with ids greater than this (next page)
+            before_id (int): Return patients with ids less than this (previous page)
+            limit (int): Maximum number of patients
+
+        Returns:
+            list: Patient dicts in ascending id order
+        """
+        try:
+            conn, cursor = self.ensure_connection()
+            if before_id is not None:
+                cursor.execute('''
+                    SELECT * FROM patients
+                    WHERE status = 'active' AND id < ?
+                    ORDER BY id DESC
+                    LIMIT ?
+                ''', (before_id, limit))
+                return [dict(row) for row in reversed(cursor.fetchall())]
+            cursor.execute('''
+                SELECT * FROM patients
+                WHERE status = 'active' AND id > ?
+                ORDER BY id
+                LIMIT ?
+            ''', (after_id or 0, limit))
+            return [dict(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error getting patients page: {e}")
+            return []
+
+    def get_patients_by_ids(self, patient_ids):
+        """Get patients by id, in the order the ids were given (missing ids are skipped)"""
+        try:
+            conn, cursor = self.ensure_connection()
+            found = {}
+            patient_ids = list(patient_ids)
+            for i in range(0, len(patient_ids), 500):
+                chunk = patient_ids[i:i + 500]
+                cursor.execute(
+                    f"SELECT * FROM patients WHERE id IN ({', '.join('?' for _ in chunk)})",
+                    chunk
+                )
+                found.update((row["id"], dict(row)) for row in cursor.fetchall())
+            return [found[patient_id] for patient_id in patient_ids if patient_id in found]
+        except sqlite3.Error as e:
+            print(f"Error getting patients: {e}")
+            return []
+
     def search_patients(self, query):
         """Search patients by name, email, or phone"""
         try:
@@ -266,6 +1083,20 @@ class HospitalDB:
             print(f"Error searching patients: {e}")
             return []
 
+    def find_patients(self, query, limit=SEARCH_RESULT_LIMIT):
+        """Top matches for a type-ahead query over active patients, best first"""
+        ids = self.search_index("patients").search(query, limit)
+        return self.get_patients_by_ids(ids) if ids else []
+
+    def find_staff(self, query, roles=(Role.DOCTOR, Role.NURSE), limit=SEARCH_RESULT_LIMIT):
+        """Top matches for a type-ahead query over users in the given roles, best first"""
+        ids = self.search_index("users").search(query)
+        if not ids:
+            return []
+        staff = {user["id"]: user for user in self.get_staff(roles)}
+        return [staff[user_id] for user_id in ids if user_id in staff][:limit]
+
+    @invalidates("patients")
     def update_patient(self, patient_id, **kwargs):
         """Update patient details"""
         try:
@@ -282,11 +1113,14 @@ class HospitalDB:
 
             cursor.execute(f"UPDATE patients SET {set_clause} WHERE id = ?", values)
             conn.commit()
-            return cursor.rowcount > 0
+            updated = cursor.rowcount > 0
+            self.reindex_rows("patients", [patient_id])
+            return updated
         except sqlite3.Error as e:
             print(f"Error updating patient: {e}")
             return False
 
+    @invalidates("patients")
     def delete_patient(self, patient_id):
         """Delete a patient (or set status to inactive)"""
         try:
@@ -294,12 +1128,15 @@ class HospitalDB:
             # Soft delete by setting status to 'inactive'
             cursor.execute("UPDATE patients SET status = 'inactive' WHERE id = ?", (patient_id,))
             conn.commit()
-            return cursor.rowcount > 0
+            updated = cursor.rowcount > 0
+            self.reindex_rows("patients", [patient_id])
+            return updated
         except sqlite3.Error as e:
             print(f"Error deleting patient: {e}")
             return False
 
     # Medical record functions
+    @invalidates("medical_records")
     def add_medical_record(self, patient_id, doctor_id, diagnosis, treatment, notes=None):
         """Add a new medical record"""
         try:
@@ -315,6 +1152,7 @@ class HospitalDB:
             print(f"Error adding medical record: {e}")
             return None
 
+    @cached_read("medical_records", "users")
     def get_patient_records(self, patient_id):
         """Get all medical records for a patient"""
         try:
@@ -347,21 +1185,241 @@ class HospitalDB:
             print(f"Error getting doctor records: {e}")
             return []
 
-    # Appointment functions
-    def add_appointment(self, patient_id, doctor_id, appointment_date, appointment_time, reason=None):
-        """Add a new appointment"""
+    # Doctor profile queries, one per section of the profile page. Each ORDER BY ends on a
+    # unique key so LIMIT/OFFSET pages never repeat or skip rows that tie
+    DOCTOR_PROFILE_QUERIES = {
+        "patients": '''
+            SELECT p.*
+            FROM medical_records mr
+            JOIN patients p ON p.id = mr.patient_id
+            WHERE mr.doctor_id = :doctor_id AND p.status = 'active'
+            GROUP BY mr.patient_id
+            ORDER BY mr.patient_id
+        ''',
+        "records": '''
+            SELECT mr.*, p.name as patient_name
+            FROM medical_records mr
+            JOIN patients p ON mr.patient_id = p.id
+            WHERE mr.doctor_id = :doctor_id
+            ORDER BY mr.record_date DESC, mr.id DESC
+        ''',
+        "appointments": '''
+            SELECT a.*, p.name as patient_name
+            FROM appointments a
+            JOIN patients p ON a.patient_id = p.id
+            WHERE a.doctor_id = :doctor_id
+            ORDER BY a.appointment_date, a.appointment_time, a.id
+        ''',
+        "prescriptions": '''
+            SELECT pr.*, mr.diagnosis, mr.record_date, p.name as patient_name
+            FROM medical_records mr
+            JOIN prescriptions pr ON pr.record_id = mr.id
+            JOIN patients p ON mr.patient_id = p.id
+            WHERE mr.doctor_id = :doctor_id
+            ORDER BY mr.record_date DESC, pr.id
+        ''',
+    }
+
+    def get_doctor_profile_page(self, doctor_id, section, offset=0, limit=PROFILE_PAGE_SIZE):
+        """
+        Get one page of a doctor's patients, records, appointments or prescriptions.
+
+        Args:
+            doctor_id (int): Doctor's user ID
+            section (str): "patients", "records", "appointments" or "prescriptions"
+            offset (int): Rows to skip
+            limit (int): Maximum rows to return
+
+        Returns:
+            list: Rows for the requested page
+        """
+        try:
+            conn, cursor = self.ensure_connection()
+            cursor.execute(
+                self.DOCTOR_PROFILE_QUERIES[section] + " LIMIT :limit OFFSET :offset",
+                {"doctor_id": doctor_id, "limit": limit, "offset": offset}
+            )
+            return [dict(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error getting doctor profile {section}: {e}")
+            return []
+
+    def get_doctor_profile_summary(self, doctor_id, limit=PROFILE_PAGE_SIZE):
+        """
+        Get the counts and first page of every section of a doctor's profile.
+
+        Counts come from one grouped query over the doctor's index ranges, so the
+        cost does not depend on how many patients the hospital has.
+
+        Returns:
+            dict: {"counts": {section: int}, section: [first page of rows], ...}
+        """
         try:
             conn, cursor = self.ensure_connection()
+            if conn.in_transaction:
+                conn.commit()
+            # Counts and pages come from the same snapshot
+            cursor.execute("BEGIN")
             cursor.execute('''
-                INSERT INTO appointments (patient_id, doctor_id, appointment_date, appointment_time, reason)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (patient_id, doctor_id, appointment_date, appointment_time, reason))
+                SELECT
+                    (SELECT COUNT(*) FROM (
+                        SELECT DISTINCT patient_id FROM medical_records WHERE doctor_id = :doctor_id
+                    ) dp JOIN patients p ON p.id = dp.patient_id
+                     WHERE p.status = 'active') AS patients,
+                    (SELECT COUNT(*) FROM medical_records WHERE doctor_id = :doctor_id) AS records,
+                    (SELECT COUNT(*) FROM appointments WHERE doctor_id = :doctor_id) AS appointments,
+                    (SELECT COUNT(*) FROM medical_records mr
+                     JOIN prescriptions pr ON pr.record_id = mr.id
+                     WHERE mr.doctor_id = :doctor_id) AS prescriptions
+            ''', {"doctor_id": doctor_id})
+            summary = {"counts": dict(cursor.fetchone())}
+            for section in self.DOCTOR_PROFILE_QUERIES:
+                summary[section] = self.get_doctor_profile_page(doctor_id, section, 0, limit)
             conn.commit()
-            return cursor.lastrowid
+            return summary
         except sqlite3.Error as e:
+            self.rollback()
+            print(f"Error getting doctor profile summary: {e}")
+            return {"counts": dict.fromkeys(self.DOCTOR_PROFILE_QUERIES, 0),
+                    **{section: [] for section in self.DOCTOR_PROFILE_QUERIES}}
+
+    # Appointment functions
+    @invalidates("appointments", "doctor_day_occupancy")
+    def add_appointment(self, patient_id, doctor_id, appointment_date, appointment_time, reason=None,
+                        duration=DEFAULT_APPOINTMENT_MINUTES, on_conflict="reject"):
+        """
+        Add a new appointment, checking the doctor's calendar for overlaps.
+
+        Args:
+            duration (int): Length of the appointment in minutes
+            on_conflict (str): "reject" to refuse overlapping slots, "raise" to refuse them
+                with AppointmentConflict, "flag" to book them anyway with conflict_flag set
+
+        Returns:
+            int: The new appointment id, or None if it was rejected or failed
+        """
+        try:
+            conn, cursor = self.ensure_connection()
+            if not 0 < duration <= MAX_APPOINTMENT_MINUTES:
+                print(f"Error adding appointment: duration must be between 1 and {MAX_APPOINTMENT_MINUTES} minutes")
+                return None
+            start_at, end_at = appointment_interval(appointment_date, appointment_time, duration)
+
+            # Check and insert under the same write lock so two bookings can't race into one slot
+            self.begin_immediate(conn)
+            conflicts = self._find_conflicts(cursor, doctor_id, start_at, end_at)
+            if conflicts and on_conflict == "raise":
+                conn.rollback()
+                raise AppointmentConflict(conflicts)
+            if conflicts and on_conflict == "reject":
+                conn.rollback()
+                print(f"Error adding appointment: doctor {doctor_id} is already booked at {conflicts[0]['start_at']}")
+                return None
+
+            cursor.execute('''
+                INSERT INTO appointments (patient_id, doctor_id, appointment_date, appointment_time, reason,
+                                          duration, start_at, end_at, conflict_flag)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (patient_id, doctor_id, appointment_date, appointment_time, reason,
+                  duration, start_at, end_at, 1 if conflicts else 0))
+            appointment_id = cursor.lastrowid
+            self._refresh_occupancy_for_interval(cursor, doctor_id, start_at, end_at)
+            conn.commit()
+            return appointment_id
+        except (sqlite3.Error, ValueError) as e:
+            self.rollback()
             print(f"Error adding appointment: {e}")
             return None
 
+    def _find_conflicts(self, cursor, doctor_id, start_at, end_at, exclude_id=None):
+        """Return the doctor's active appointments overlapping [start_at, end_at)"""
+        # Anything overlapping must start within MAX_APPOINTMENT_MINUTES before start_at,
+        # so this is a short range seek on idx_appointments_doctor_interval rather than a scan
+        earliest = (datetime.strptime(start_at, APPOINTMENT_TS_FORMAT)
+                    - timedelta(minutes=MAX_APPOINTMENT_MINUTES)).strftime(APPOINTMENT_TS_FORMAT)
+        cursor.execute('''
+            SELECT id, patient_id, doctor_id, start_at, end_at
+            FROM appointments
+            WHERE doctor_id = ? AND start_at > ? AND start_at < ? AND end_at > ?
+              AND status != 'cancelled' AND id != ?
+        ''', (doctor_id, earliest, end_at, start_at, exclude_id or -1))
+        return [dict(row) for row in cursor.fetchall()]
+
+    def find_appointment_conflicts(self, doctor_id, appointment_date, appointment_time,
+                                   duration=DEFAULT_APPOINTMENT_MINUTES, exclude_id=None):
+        """Get the appointments that would overlap a proposed slot for a doctor"""
+        try:
+            conn, cursor = self.ensure_connection()
+            start_at, end_at = appointment_interval(appointment_date, appointment_time, duration)
+            return self._find_conflicts(cursor, doctor_id, start_at, end_at, exclude_id)
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Error checking appointment conflicts: {e}")
+            return []
+
+    def check_schedule_conflicts(self, appointments):
+        """
+        Bulk-check an imported schedule for overlaps without writing anything.
+
+        Args:
+            appointments (list): Dicts with doctor_id, appointment_date, appointment_time
+                and optionally duration
+
+        Returns:
+            list: One dict per problem with the batch "index" and a "type" of
+                "batch" (overlaps another imported row, see "other"),
+                "existing" (overlaps booked appointment "other") or "invalid"
+        """
+        problems = []
+        by_doctor = {}
+        for index, appt in enumerate(appointments):
+            duration = appt.get("duration") or DEFAULT_APPOINTMENT_MINUTES
+            try:
+                if not 0 < duration <= MAX_APPOINTMENT_MINUTES:
+                    raise ValueError(f"duration must be between 1 and {MAX_APPOINTMENT_MINUTES} minutes")
+                start_at, end_at = appointment_interval(appt["appointment_date"], appt["appointment_time"], duration)
+            except (KeyError, TypeError, ValueError) as e:
+                problems.append({"index": index, "type": "invalid", "error": str(e)})
+                continue
+            by_doctor.setdefault(appt.get("doctor_id"), []).append((start_at, end_at, index))
+
+        try:
+            conn, cursor = self.ensure_connection()
+            for doctor_id, slots in by_doctor.items():
+                slots.sort()
+
+                # Sweep the batch itself: a slot overlaps if it starts before the furthest end seen so far
+                furthest_end, furthest_index = None, None
+                for start_at, end_at, index in slots:
+                    if furthest_end is not None and start_at < furthest_end:
+                        problems.append({"index": index, "type": "batch", "other": furthest_index})
+                    if furthest_end is None or end_at > furthest_end:
+                        furthest_end, furthest_index = end_at, index
+
+                # One indexed range read per doctor covering the whole batch window
+                earliest = (datetime.strptime(slots[0][0], APPOINTMENT_TS_FORMAT)
+                            - timedelta(minutes=MAX_APPOINTMENT_MINUTES)).strftime(APPOINTMENT_TS_FORMAT)
+                cursor.execute('''
+                    SELECT id, start_at, end_at
+                    FROM appointments
+                    WHERE doctor_id = ? AND start_at > ? AND start_at < ? AND status != 'cancelled'
+                    ORDER BY start_at
+                ''', (doctor_id, earliest, furthest_end))
+                existing = cursor.fetchall()
+                starts = [row["start_at"] for row in existing]
+
+                for start_at, end_at, index in slots:
+                    earliest = (datetime.strptime(start_at, APPOINTMENT_TS_FORMAT)
+                                - timedelta(minutes=MAX_APPOINTMENT_MINUTES)).strftime(APPOINTMENT_TS_FORMAT)
+                    for row in existing[bisect_right(starts, earliest):bisect_left(starts, end_at)]:
+                        if row["end_at"] > start_at:
+                            problems.append({"index": index, "type": "existing", "other": row["id"]})
+                            break
+        except sqlite3.Error as e:
+            print(f"Error checking schedule conflicts: {e}")
+
+        problems.sort(key=lambda problem: problem["index"])
+        return problems
+
     def get_appointments(self, patient_id=None, doctor_id=None, date=None):
         """Get appointments, optionally filtered by patient, doctor, or date"""
         try:
@@ -388,21 +1446,288 @@ class HospitalDB:
             print(f"Error getting appointments: {e}")
             return []
 
+    def get_appointments_range(self, start, end, doctor_ids=None, status=None):
+        """
+        Get appointments between two dates (inclusive) for calendar views.
+
+        Args:
+            start (str): First day, "YYYY-MM-DD"
+            end (str): Last day, "YYYY-MM-DD"
+            doctor_ids (list): Only these doctors; all doctors when None
+            status (str): Only appointments with this status
+
+        Returns:
+            list: Appointments with patient_name and doctor_name, ordered by
+                doctor then date and time when doctor_ids is given, otherwise
+                by date and time (both come straight from the index)
+        """
+        try:
+            conn, cursor = self.ensure_connection()
+            query = '''
+                SELECT a.id, a.doctor_id, a.patient_id, a.appointment_date, a.appointment_time, a.status,
+                       p.name as patient_name, u.name as doctor_name
+                FROM appointments a
+                JOIN patients p ON a.patient_id = p.id
+                JOIN users u ON a.doctor_id = u.id
+                WHERE a.appointment_date BETWEEN ? AND ?
+            '''
+            params = [start, end]
+
+            if doctor_ids is not None:
+                if not doctor_ids:
+                    return []
+                query += f" AND a.doctor_id IN ({', '.join('?' for _ in doctor_ids)})"
+                params.extend(doctor_ids)
+            if status:
+                query += " AND a.status = ?"
+                params.append(status)
+
+            if doctor_ids is not None:
+                query += " ORDER BY a.doctor_id, a.appointment_date, a.appointment_time"
+            else:
+                query += " ORDER BY a.appointment_date, a.appointment_time"
+            cursor.execute(query, params)
+            return [dict(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Error getting appointments range: {e}")
+            return []
+
+    @invalidates("appointments", "doctor_day_occupancy")
     def update_appointment_status(self, appointment_id, status):
         """Update the status of an appointment"""
         try:
             conn, cursor = self.ensure_connection()
+            self.begin_immediate(conn)
             cursor.execute(
                 "UPDATE appointments SET status = ? WHERE id = ?", 
                 (status, appointment_id)
             )
+            updated = cursor.rowcount > 0
+            if updated:
+                # Cancelling (or restoring) a booking changes the doctor's free time
+                cursor.execute("SELECT doctor_id, start_at, end_at FROM appointments WHERE id = ?", (appointment_id,))
+                row = cursor.fetchone()
+                if row["start_at"]:
+                    self._refresh_occupancy_for_interval(cursor, row["doctor_id"], row["start_at"], row["end_at"])
             conn.commit()
-            return cursor.rowcount > 0
+            return updated
         except sqlite3.Error as e:
+            self.rollback()
             print(f"Error updating appointment status: {e}")
             return False
 
+    # Availability functions
+    @invalidates("doctor_working_hours")
+    def set_working_hours(self, doctor_id, weekday, start_time, end_time):
+        """Set a doctor's working hours for one weekday (0 = Monday)"""
+        try:
+            conn, cursor = self.ensure_connection()
+            cursor.execute('''
+                INSERT INTO doctor_working_hours (doctor_id, weekday, start_time, end_time)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (doctor_id, weekday) DO UPDATE
+                SET start_time = excluded.start_time, end_time = excluded.end_time
+            ''', (doctor_id, weekday, start_time, end_time))
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            print(f"Error setting working hours: {e}")
+            return False
+
+    def get_working_hours(self, doctor_id):
+        """Get a doctor's working hours as {weekday: (start_time, end_time)}"""
+        try:
+            conn, cursor = self.ensure_connection()
+            cursor.execute(
+                "SELECT weekday, start_time, end_time FROM doctor_working_hours WHERE doctor_id = ?",
+                (doctor_id,)
+            )
+            hours = {row["weekday"]: (row["start_time"], row["end_time"]) for row in cursor.fetchall()}
+            return hours or dict(DEFAULT_WORKING_HOURS)
+        except sqlite3.Error as e:
+            print(f"Error getting working hours: {e}")
+            return dict(DEFAULT_WORKING_HOURS)
+
+    def _refresh_occupancy(self, cursor, doctor_id, day):
+        """Recompute one doctor/day occupancy bitmap from the active appointments"""
+        day_start = f"{day} 00:00"
+        next_day = (datetime.strptime(day, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+        earliest = (datetime.strptime(day_start, APPOINTMENT_TS_FORMAT)
+                    - timedelta(minutes=MAX_APPOINTMENT_MINUTES)).strftime(APPOINTMENT_TS_FORMAT)
+        cursor.execute('''
+            SELECT start_at, end_at
+            FROM appointments
+            WHERE doctor_id = ? AND start_at > ? AND start_at < ? AND end_at > ? AND status != 'cancelled'
+        ''', (doctor_id, earliest, f"{next_day} 00:00", day_start))
+
+        bitmap = 0
+        for row in cursor.fetchall():
+            # Clip intervals that spill over midnight to this day
+            start = minutes_since_midnight(row["start_at"][11:]) if row["start_at"] >= day_start else 0
+            end = minutes_since_midnight(row["end_at"][11:]) if row["end_at"][:10] == day else 24 * 60
+            bitmap |= slot_mask(start, end)
+
+        if bitmap:
+            cursor.execute('''
+                INSERT OR REPLACE INTO doctor_day_occupancy (doctor_id, day, bitmap)
+                VALUES (?, ?, ?)
+            ''', (doctor_id, day, bitmap.to_bytes(OCCUPANCY_BYTES, "little")))
+        else:
+            cursor.execute("DELETE FROM doctor_day_occupancy WHERE doctor_id = ? AND day = ?", (doctor_id, day))
+
+    def _refresh_occupancy_for_interval(self, cursor, doctor_id, start_at, end_at):
+        """Refresh the bitmaps of every day an appointment touches"""
+        self._refresh_occupancy(cursor, doctor_id, start_at[:10])
+        if end_at[:10] != start_at[:10] and end_at[11:] != "00:00":
+            self._refresh_occupancy(cursor, doctor_id, end_at[:10])
+
+    def _rebuild_occupancy(self, cursor):
+        """Recompute all occupancy bitmaps from scratch"""
+        cursor.execute("DELETE FROM doctor_day_occupancy")
+        cursor.execute('''
+            SELECT DISTINCT doctor_id, substr(start_at, 1, 10) AS day
+            FROM appointments
+            WHERE start_at IS NOT NULL AND status != 'cancelled'
+            UNION
+            SELECT DISTINCT doctor_id, substr(end_at, 1, 10) AS day
+            FROM appointments
+            WHERE end_at IS NOT NULL AND status != 'cancelled' AND substr(end_at, 12) != '00:00'
+        ''')
+        for row in cursor.fetchall():
+            self._refresh_occupancy(cursor, row["doctor_id"], row["day"])
+
+    def rebuild_occupancy(self):
+        """Rebuild the availability bitmaps, e.g. after appointments were edited outside HospitalDB"""
+        try:
+            conn, cursor = self.ensure_connection()
+            self.begin_immediate(conn)
+            self._rebuild_occupancy(cursor)
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            self.rollback()
+            print(f"Error rebuilding occupancy: {e}")
+            return False
+
+    def find_free_slots(self, doctor_id=None, specialization=None, date_range=None,
+                        duration=DEFAULT_APPOINTMENT_MINUTES, step=15, limit=None):
+        """
+        Find open appointment slots for one doctor or every doctor in a specialization.
+
+        Args:
+            doctor_id (int): Doctor to search, or None to search by specialization
+            specialization (str): Department to search when doctor_id is not given
+            date_range (tuple): (start_date, end_date) as "YYYY-MM-DD", inclusive;
+                defaults to today and the following 13 days
+            duration (int): Required slot length in minutes
+            step (int): Spacing of candidate start times in minutes
+            limit (int): Maximum number of slots to return
+
+        Returns:
+            list: Slots with doctor_id, doctor_name, date, time and end_time,
+                ordered by date and time
+        """
+        try:
+            conn, cursor = self.ensure_connection()
+            if doctor_id:
+                cursor.execute("SELECT id, name FROM users WHERE id = ?", (doctor_id,))
+            elif specialization:
+                cursor.execute('''
+                    SELECT id, name FROM users
+                    WHERE role = 'doctor' AND status = 'active' AND specialization = ? COLLATE NOCASE
+                ''', (specialization,))
+            else:
+                return []
+            doctors = {row["id"]: row["name"] for row in cursor.fetchall()}
+            if not doctors:
+                return []
+
+            now = datetime.now()
+            if date_range:
+                first_day = datetime.strptime(str(date_range[0])[:10], "%Y-%m-%d")
+                last_day = datetime.strptime(str(date_range[1])[:10], "%Y-%m-%d")
+            else:
+                first_day = datetime(now.year, now.month, now.day)
+                last_day = first_day + timedelta(days=13)
+
+            placeholders = ", ".join("?" for _ in doctors)
+            ids = list(doctors)
+
+            # Working hours as per-weekday bitmaps
+            work_masks = {doc_id: {} for doc_id in ids}
+            cursor.execute(
+                f"SELECT doctor_id, weekday, start_time, end_time FROM doctor_working_hours WHERE doctor_id IN ({placeholders})",
+                ids
+            )
+            for row in cursor.fetchall():
+                work_masks[row["doctor_id"]][row["weekday"]] = slot_mask(
+                    minutes_since_midnight(row["start_time"]), minutes_since_midnight(row["end_time"])
+                )
+            default_masks = {
+                weekday: slot_mask(minutes_since_midnight(start), minutes_since_midnight(end))
+                for weekday, (start, end) in DEFAULT_WORKING_HOURS.items()
+            }
+            for doc_id in ids:
+                if not work_masks[doc_id]:
+                    work_masks[doc_id] = default_masks
+
+            # One primary-key range read for every doctor/day bitmap in the window
+            cursor.execute(f'''
+                SELECT doctor_id, day, bitmap FROM doctor_day_occupancy
+                WHERE doctor_id IN ({placeholders}) AND day BETWEEN ? AND ?
+            ''', ids + [first_day.strftime("%Y-%m-%d"), last_day.strftime("%Y-%m-%d")])
+            occupancy = {(row["doctor_id"], row["day"]): int.from_bytes(row["bitmap"], "little")
+                         for row in cursor.fetchall()}
+
+            needed = -(-duration // OCCUPANCY_SLOT_MINUTES)
+            step_slots = max(step // OCCUPANCY_SLOT_MINUTES, 1)
+            step_mask = 0
+            for position in range(0, OCCUPANCY_SLOTS_PER_DAY, step_slots):
+                step_mask |= 1 << position
+
+            slots = []
+            day = first_day
+            while day <= last_day:
+                day_str = day.strftime("%Y-%m-%d")
+                # Slots earlier today are no longer bookable
+                if day.date() == now.date():
+                    past_mask = slot_mask(0, now.hour * 60 + now.minute)
+                elif day.date() < now.date():
+                    past_mask = slot_mask(0, 24 * 60)
+                else:
+                    past_mask = 0
+
+                for doc_id in ids:
+                    free = work_masks[doc_id].get(day.weekday(), 0) & ~occupancy.get((doc_id, day_str), 0) & ~past_mask
+                    # A start slot fits if the next `needed` slots are all free
+                    fits = free
+                    for shift in range(1, needed):
+                        fits &= free >> shift
+                    fits &= step_mask
+
+                    while fits:
+                        lowest = fits & -fits
+                        position = lowest.bit_length() - 1
+                        start_minute = position * OCCUPANCY_SLOT_MINUTES
+                        end_minute = start_minute + duration
+                        slots.append({
+                            "doctor_id": doc_id,
+                            "doctor_name": doctors[doc_id],
+                            "date": day_str,
+                            "time": f"{start_minute // 60:02d}:{start_minute % 60:02d}",
+                            "end_time": f"{end_minute // 60:02d}:{end_minute % 60:02d}",
+                        })
+                        fits ^= lowest
+                day += timedelta(days=1)
+
+            slots.sort(key=lambda slot: (slot["date"], slot["time"], slot["doctor_name"]))
+            return slots[:limit] if limit else slots
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Error finding free slots: {e}")
+            return []
+
     # Prescription functions
+    @invalidates("prescriptions")
     def add_prescription(self, record_id, medication, dosage=None, frequency=None, duration=None, notes=None):
         """Add a prescription to a medical record"""
         try:
@@ -444,36 +1769,156 @@ class HospitalDB:
             return []
 
     # Billing functions
-    def add_bill(self, patient_id, amount, record_id=None):
+    @invalidates("billing", "revenue_rollups")
+    def add_bill(self, patient_id, amount, record_id=None, payer=None):
         """Add a new bill for a patient"""
         try:
             conn, cursor = self.ensure_connection()
+            bill_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self.begin_immediate(conn)
+
+            # Attribute the bill to the department of the doctor who wrote the record
+            department = None
+            if record_id:
+                cursor.execute('''
+                    SELECT u.specialization FROM medical_records mr
+                    JOIN users u ON mr.doctor_id = u.id
+                    WHERE mr.id = ?
+                ''', (record_id,))
+                row = cursor.fetchone()
+                department = row["specialization"] if row else None
+            department = department or UNASSIGNED_DEPARTMENT
+
             cursor.execute('''
-                INSERT INTO billing (patient_id, record_id, amount)
-                VALUES (?, ?, ?)
-            ''', (patient_id, record_id, amount))
+                INSERT INTO billing (patient_id, record_id, amount, bill_date, department, payer, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (patient_id, record_id, amount, bill_date, department, payer or DEFAULT_PAYER, bill_date))
+            bill_id = cursor.lastrowid
+            self._apply_revenue_rollup(cursor, bill_date, "pending", None, department, 1, amount)
             conn.commit()
-            return cursor.lastrowid
+            return bill_id
         except sqlite3.Error as e:
+            self.rollback()
             print(f"Error adding bill: {e}")
             return None
 
+    @invalidates("billing", "revenue_rollups")
     def update_payment(self, bill_id, payment_status, payment_method=None):
         """Update payment status and method for a bill"""
         try:
             conn, cursor = self.ensure_connection()
-            payment_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S") if payment_status == 'paid' else None
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            payment_date = now if payment_status == 'paid' else None
+            self.begin_immediate(conn)
+            cursor.execute(
+                "SELECT amount, payment_status, payment_method, bill_date, department FROM billing WHERE id = ?",
+                (bill_id,)
+            )
+            old = cursor.fetchone()
             cursor.execute('''
                 UPDATE billing 
-                SET payment_status = ?, payment_method = ?, payment_date = ?
+                SET payment_status = ?, payment_method = ?, payment_date = ?, updated_at = ?
                 WHERE id = ?
-            ''', (payment_status, payment_method, payment_date, bill_id))
+            ''', (payment_status, payment_method, payment_date, now, bill_id))
+            updated = cursor.rowcount > 0
+
+            if updated:
+                # Move the bill from its old status/method bucket to the new one
+                self._apply_revenue_rollup(cursor, old["bill_date"], old["payment_status"], old["payment_method"],
+                                           old["department"], -1, -old["amount"])
+                self._apply_revenue_rollup(cursor, old["bill_date"], payment_status, payment_method,
+                                           old["department"], 1, old["amount"])
             conn.commit()
-            return cursor.rowcount > 0
+            return updated
         except sqlite3.Error as e:
+            self.rollback()
             print(f"Error updating payment: {e}")
             return False
 
+    def _apply_revenue_rollup(self, cursor, bill_date, payment_status, payment_method, department,
+                              count_delta, amount_delta):
+        """Add a bill's contribution to its daily and monthly rollup rows"""
+        for period, bucket in (("day", bill_date[:10]), ("month", bill_date[:7])):
+            cursor.execute('''
+                INSERT INTO revenue_rollups
+                    (period, bucket, payment_status, payment_method, department, bill_count, total_amount)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (period, bucket, payment_status, payment_method, department) DO UPDATE
+                SET bill_count = bill_count + excluded.bill_count,
+                    total_amount = total_amount + excluded.total_amount
+            ''', (period, bucket, payment_status or "pending", payment_method or UNSPECIFIED_METHOD,
+                  department or UNASSIGNED_DEPARTMENT, count_delta, amount_delta))
+
+    def _rebuild_revenue_rollups(self, cursor):
+        """Recompute every rollup row from the billing table"""
+        cursor.execute("DELETE FROM revenue_rollups")
+        for period, length in (("day", 10), ("month", 7)):
+            cursor.execute(f'''
+                INSERT INTO revenue_rollups
+                    (period, bucket, payment_status, payment_method, department, bill_count, total_amount)
+                SELECT ?, substr(bill_date, 1, {length}), COALESCE(payment_status, 'pending'),
+                       COALESCE(payment_method, ?), COALESCE(department, ?), COUNT(*), SUM(amount)
+                FROM billing
+                WHERE bill_date IS NOT NULL
+                GROUP BY 2, 3, 4, 5
+            ''', (period, UNSPECIFIED_METHOD, UNASSIGNED_DEPARTMENT))
+
+    def rebuild_revenue_rollups(self):
+        """Rebuild the revenue rollups, e.g. after bills were edited outside HospitalDB"""
+        try:
+            conn, cursor = self.ensure_connection()
+            self.begin_immediate(conn)
+            self._rebuild_revenue_rollups(cursor)
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            self.rollback()
+            print(f"Error rebuilding revenue rollups: {e}")
+            return False
+
+    def get_revenue_rollup(self, period="month", start=None, end=None, group_by=("payment_status",)):
+        """
+        Get billing totals from the rollup tables.
+
+        Args:
+            period (str): "day" or "month"
+            start (str): First bucket to include ("YYYY-MM-DD" or "YYYY-MM"), optional
+            end (str): Last bucket to include, optional
+            group_by (tuple): Any of "payment_status", "payment_method", "department"
+
+        Returns:
+            list: One row per bucket and group with bill_count, total_amount and avg_amount
+        """
+        try:
+            conn, cursor = self.ensure_connection()
+            dimensions = [d for d in group_by if d in ROLLUP_DIMENSIONS]
+            columns = ", ".join(["bucket"] + dimensions)
+            query = f'''
+                SELECT {columns}, SUM(bill_count) AS bill_count, SUM(total_amount) AS total_amount
+                FROM revenue_rollups
+                WHERE period = ?
+            '''
+            params = [period]
+            if start:
+                query += " AND bucket >= ?"
+                params.append(start)
+            if end:
+                query += " AND bucket <= ?"
+                params.append(end)
+            query += f" GROUP BY {columns} HAVING SUM(bill_count) > 0 ORDER BY {columns}"
+            cursor.execute(query, params)
+
+            rows = []
+            for row in cursor.fetchall():
+                row = dict(row)
+                row["total_amount"] = round(row["total_amount"], 2)
+                row["avg_amount"] = round(row["total_amount"] / row["bill_count"], 2)
+                rows.append(row)
+            return rows
+        except sqlite3.Error as e:
+            print(f"Error getting revenue rollup: {e}")
+            return []
+
     def get_patient_bills(self, patient_id):
         """Get all bills for a patient"""
         try:
@@ -506,6 +1951,132 @@ class HospitalDB:
             print(f"Error getting pending bills: {e}")
             return []
 
+    # Accounts-receivable aging
+    def _insert_ar_aging(self, cursor, as_of, patient_ids=None):
+        """Aggregate outstanding bills into ar_aging in one pass over idx_billing_outstanding"""
+        query = '''
+            INSERT INTO ar_aging (patient_id, payer, days_0_30, days_31_60, days_61_90, days_90_plus,
+                                  total_outstanding, bill_count)
+            SELECT patient_id, payer,
+                   SUM(CASE WHEN age <= 30 THEN amount ELSE 0 END),
+                   SUM(CASE WHEN age BETWEEN 31 AND 60 THEN amount ELSE 0 END),
+                   SUM(CASE WHEN age BETWEEN 61 AND 90 THEN amount ELSE 0 END),
+                   SUM(CASE WHEN age > 90 THEN amount ELSE 0 END),
+                   SUM(amount),
+                   COUNT(*)
+            FROM (
+                SELECT patient_id, payer, amount,
+                       CAST(julianday(?) - julianday(substr(bill_date, 1, 10)) AS INTEGER) AS age
+                FROM billing
+                WHERE payment_status = 'pending' {patient_filter}
+            )
+            GROUP BY patient_id, payer
+        '''
+        if patient_ids is None:
+            cursor.execute(query.format(patient_filter=""), (as_of,))
+            return
+        patient_ids = list(patient_ids)
+        for i in range(0, len(patient_ids), 500):
+            chunk = patient_ids[i:i + 500]
+            patient_filter = f"AND patient_id IN ({', '.join('?' for _ in chunk)})"
+            cursor.execute(query.format(patient_filter=patient_filter), [as_of] + chunk)
+
+    def refresh_ar_aging(self, as_of=None, full=False):
+        """
+        Bring the materialized AR aging buckets up to date.
+
+        Bills changed since the last watermark (billing.updated_at) are re-aggregated
+        for their patients only. A new as_of date shifts every bucket, so it (or
+        full=True) triggers a complete rebuild instead.
+
+        Args:
+            as_of (str): Date the ages are measured from, "YYYY-MM-DD" (default today)
+            full (bool): Force a complete rebuild
+
+        Returns:
+            bool: True if the refresh succeeded
+        """
+        try:
+            conn, cursor = self.ensure_connection()
+            as_of = as_of or datetime.now().strftime("%Y-%m-%d")
+            self.begin_immediate(conn)
+
+            cursor.execute("SELECT as_of, watermark FROM ar_aging_state WHERE id = 1")
+            state = cursor.fetchone()
+            cursor.execute("SELECT MAX(updated_at) AS watermark FROM billing")
+            watermark = cursor.fetchone()["watermark"]
+
+            if full or state is None or state["as_of"] != as_of:
+                cursor.execute("DELETE FROM ar_aging")
+                self._insert_ar_aging(cursor, as_of)
+            elif watermark and (state["watermark"] is None or watermark >= state["watermark"]):
+                # >= so bills written in the same second as the last refresh are not missed
+                cursor.execute(
+                    "SELECT DISTINCT patient_id FROM billing WHERE updated_at >= ?",
+                    (state["watermark"] or "",)
+                )
+                changed = [row["patient_id"] for row in cursor.fetchall()]
+                for i in range(0, len(changed), 500):
+                    chunk = changed[i:i + 500]
+                    cursor.execute(
+                        f"DELETE FROM ar_aging WHERE patient_id IN ({', '.join('?' for _ in chunk)})",
+                        chunk
+                    )
+                self._insert_ar_aging(cursor, as_of, changed)
+
+            cursor.execute('''
+                INSERT INTO ar_aging_state (id, as_of, watermark) VALUES (1, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET as_of = excluded.as_of, watermark = excluded.watermark
+            ''', (as_of, watermark))
+            conn.commit()
+            return True
+        except sqlite3.Error as e:
+            self.rollback()
+            print(f"Error refreshing AR aging: {e}")
+            return False
+
+    def get_ar_aging(self, as_of=None, by="patient", refresh=True):
+        """
+        Get outstanding amounts bucketed into 0-30/31-60/61-90/90+ days.
+
+        Args:
+            as_of (str): Date the ages are measured from, "YYYY-MM-DD" (default today)
+            by (str): "patient" for one row per patient and payer, "payer" for payer totals
+            refresh (bool): Refresh the materialized buckets first
+
+        Returns:
+            list: Rows with the bucket amounts, total_outstanding and bill_count
+        """
+        if refresh:
+            self.refresh_ar_aging(as_of)
+        try:
+            conn, cursor = self.ensure_connection()
+            if by == "payer":
+                cursor.execute('''
+                    SELECT payer,
+                           SUM(days_0_30) AS days_0_30, SUM(days_31_60) AS days_31_60,
+                           SUM(days_61_90) AS days_61_90, SUM(days_90_plus) AS days_90_plus,
+                           SUM(total_outstanding) AS total_outstanding, SUM(bill_count) AS bill_count
+                    FROM ar_aging
+                    GROUP BY payer
+                    ORDER BY total_outstanding DESC
+                ''')
+            else:
+                cursor.execute('''
+                    SELECT ag.*, p.name as patient_name
+                    FROM ar_aging ag
+                    JOIN patients p ON ag.patient_id = p.id
+                    ORDER BY ag.total_outstanding DESC
+                ''')
+            rows = [dict(row) for row in cursor.fetchall()]
+            for row in rows:
+                for column in AR_AGING_BUCKETS + ("total_outstanding",):
+                    row[column] = round(row[column], 2)
+            return rows
+        except sqlite3.Error as e:
+            print(f"Error getting AR aging: {e}")
+            return []
+
     # Dashboard statistics
     def get_dashboard_stats(self):
         """Get statistics for the dashboard"""
@@ -680,6 +2251,15 @@ class HospitalDB:
                 ORDER BY doctor_count DESC
             ''')
             departments = [dict(row) for row in cursor.fetchall()]
+
+            # Average billing per department straight from the monthly rollups
+            cursor.execute('''
+                SELECT department, SUM(total_amount) / SUM(bill_count) as avg_billing
+                FROM revenue_rollups
+                WHERE period = 'month'
+                GROUP BY department
+            ''')
+            avg_billing = {row['department']: row['avg_billing'] for row in cursor.fetchall()}
             
             # For each department, get patient count (from medical records)
             for dept in departments:
@@ -702,16 +2282,7 @@ class HospitalDB:
                 result = cursor.fetchone()
                 dept['appointment_count'] = result['appointment_count'] if result else 0
                 
-                # Calculate average billing amount per department
-                cursor.execute('''
-                    SELECT AVG(b.amount) as avg_billing
-                    FROM billing b
-                    JOIN medical_records mr ON b.record_id = mr.id
-                    JOIN users u ON mr.doctor_id = u.id
-                    WHERE u.specialization = ?
-                ''', (dept['department'],))
-                result = cursor.fetchone()
-                dept['avg_billing'] = round(result['avg_billing'], 2) if result and result['avg_billing'] else 0
+                dept['avg_billing'] = round(avg_billing[dept['department']], 2) if avg_billing.get(dept['department']) else 0
             
             return departments
         except sqlite3.Error as e:
@@ -894,4 +2465,23 @@ class HospitalDB:
             return appointments
         except sqlite3.Error as e:
             print(f"Error getting today's top appointments: {e}")
-            return []
\ No newline at end of file
+            return []
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Hospital database maintenance")
+    parser.add_argument("command", choices=["rebuild-rollups", "rebuild-occupancy", "refresh-ar-aging"])
+    parser.add_argument("--db", default="hospital.db", help="Path to the SQLite database")
+    args = parser.parse_args()
+
+    db = HospitalDB(args.db)
+    if args.command == "rebuild-rollups":
+        ok = db.rebuild_revenue_rollups()
+    elif args.command == "refresh-ar-aging":
+        ok = db.refresh_ar_aging(full=True)
+    else:
+        ok = db.rebuild_occupancy()
+    db.close()
+    print("Done" if ok else "Failed")
@@ -1,55 +1,37 @@
+import startup_profiler
+# Installed before anything else is imported so the report covers every import
+startup_profiler.start_if_requested()
+
 import flet as ft
-import sqlite3
 import hashlib
-import datetime
-import subprocess
-import sys
-import os
+import importlib
+import threading
+from db_utils import HospitalDB
+from session import sessions
 
 class LoginApp:
-    def __init__(self):
-        self.conn = sqlite3.connect('hospital.db')
-        self.cursor = self.conn.cursor()
+    def __init__(self, db=None):
+        # One HospitalDB is shared by the login screen and the main app
+        self.db = db or HospitalDB()
         self.setup_database()
         
     def setup_database(self):
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                role TEXT NOT NULL,
-                specialization TEXT,
-                phone TEXT,
-                address TEXT,
-                date_joined TEXT,
-                status TEXT DEFAULT 'active'
-            )
-        ''')
-        self.conn.commit()
-        
-        # Create admin user if it doesn't exist
-        self.cursor.execute("SELECT * FROM users WHERE email = 'admin@hospital.com'")
-        if not self.cursor.fetchone():
-            hashed_password = hashlib.sha256("admin123".encode()).hexdigest()
-            today = datetime.datetime.now().strftime("%Y-%m-%d")
-            self.cursor.execute('''
-                INSERT INTO users (name, email, password, role, date_joined, status)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', ("Admin User", "admin@hospital.com", hashed_password, "admin", today, "active"))
-            self.conn.commit()
+        # HospitalDB creates the users table; only the default admin is added here
+        if not self.db.get_user(email="admin@hospital.com"):
+            hashed_password = self.hash_password("admin123")
+            self.db.add_user("Admin User", "admin@hospital.com", hashed_password, "admin")
     
     def hash_password(self, password):
         return hashlib.sha256(password.encode()).hexdigest()
     
     def verify_user(self, email, password):
         hashed_password = self.hash_password(password)
-        self.cursor.execute('''
+        conn, cursor = self.db.ensure_connection()
+        cursor.execute('''
             SELECT id, name, email, role, status FROM users 
             WHERE email = ? AND password = ?
         ''', (email, hashed_password))
-        user = self.cursor.fetchone()
+        user = cursor.fetchone()
         
         if user and user[4] == 'active':
             return {
@@ -63,57 +45,48 @@ class LoginApp:
     def register_user(self, user_data):
         try:
             # Check if email already exists
-            self.cursor.execute("SELECT id FROM users WHERE email = ?", (user_data['email'],))
-            if self.cursor.fetchone():
+            if self.db.get_user(email=user_data['email']):
                 return False, "Email already registered."
                 
             hashed_password = self.hash_password(user_data['password'])
-            today = datetime.datetime.now().strftime("%Y-%m-%d")
-            
-            self.cursor.execute('''
-                INSERT INTO users (name, email, password, role, specialization, phone, address, date_joined, status)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
+            user_id = self.db.add_user(
                 user_data['name'],
                 user_data['email'],
                 hashed_password,
                 user_data['role'],
-                user_data.get('specialization', None),
-                user_data.get('phone', None),
-                user_data.get('address', None),
-                today,
-                'active'
-            ))
-            self.conn.commit()
+                specialization=user_data.get('specialization', None),
+                phone=user_data.get('phone', None),
+                address=user_data.get('address', None),
+            )
+            if not user_id:
+                return False, "Registration failed."
             return True, "Registration successful!"
         except Exception as e:
             return False, f"Registration failed: {str(e)}"
     
-    def launch_main_app(self, user_data):
-        # Create a temporary file to pass user data
-        with open('user_session.txt', 'w') as f:
-            f.write(f"{user_data['id']}\n")
-            f.write(f"{user_data['name']}\n")
-            f.write(f"{user_data['email']}\n")
-            f.write(f"{user_data['role']}\n")
-        
-        # Launch main.py
+    def launch_main_app(self, page):
+        """Swap the login screen for the main app, for the page's logged-in session"""
         try:
-            if getattr(sys, 'frozen', False):
-                # Running as compiled executable
-                script_dir = os.path.dirname(sys.executable)
-            else:
-                # Running as script
-                script_dir = os.path.dirname(os.path.abspath(__file__))
-                
-            main_path = os.path.join(script_dir, 'app.py')
-            subprocess.Popen([sys.executable, main_path])
-            return True
+            medicare = importlib.import_module("app")
         except Exception as e:
             print(f"Error launching main app: {e}")
             return False
+
+        page.controls.clear()
+        page.vertical_alignment = ft.MainAxisAlignment.START
+        page.horizontal_alignment = ft.CrossAxisAlignment.START
+        medicare.main(page, db=self.db, on_logout=lambda: self.login_page(page))
+        return True
+    
+    def preload_main_app(self):
+        """Import the main app in the background while the user types their credentials"""
+        def preload():
+            importlib.import_module("app")
+            startup_profiler.mark("main app imported")
+        threading.Thread(target=preload, daemon=True).start()
     
     def login_page(self, page: ft.Page):
+        self.preload_main_app()
         page.title = "Hospital Management System - Login"
         page.vertical_alignment = ft.MainAxisAlignment.CENTER
         page.horizontal_alignment = ft.CrossAxisAlignment.CENTER
@@ -135,6 +108,7 @@ class LoginApp:
             
             user = self.verify_user(email, password)
             if user:
+                startup_profiler.mark("logged in")
                 page.snack_bar = ft.SnackBar(
                     content=ft.Text(f"Login successful! Welcome, {user['name']}"),
                     bgcolor=ft.Colors.GREEN_400
@@ -142,9 +116,9 @@ class LoginApp:
                 page.snack_bar.open = True
                 page.update()
                 
-                # Launch main app and close login window
-                if self.launch_main_app(user):
-                    page.window.close()
+                # Replace the login screen with the main app
+                sessions.start(page.session_id, user, persist=not page.web)
+                self.launch_main_app(page)
             else:
                 page.snack_bar = ft.SnackBar(
                     content=ft.Text("Invalid email or password"),
@@ -218,6 +192,7 @@ class LoginApp:
             )
         ]
         page.update()
+        startup_profiler.mark("login screen shown")
     
     def register_page(self, page):
         page.title = "Hospital Management System - Register"
@@ -422,11 +397,15 @@ class LoginApp:
         ]
         page.update()
 
-def main(page: ft.Page):
+def main(page: ft.Page, db=None):
     page.theme_mode = ft.ThemeMode.LIGHT
     page.window.center()
-    app = LoginApp()
-    app.login_page(page)
+    app = LoginApp(db)
+    # A live session, or a valid saved token, goes straight to the main app
+    if sessions.get(page.session_id) or sessions.restore(page.session_id, app.db, persist=not page.web):
+        app.launch_main_app(page)
+    else:
+        app.login_page(page)
 
 if __name__ == "__main__":
     ft.app(target=main)
\ No newline at end of file
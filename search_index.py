@@ -0,0 +1,190 @@
+import re
+import threading
+from collections import defaultdict
+
+# Longest token prefix that gets its own postings list; longer query terms are
+# looked up by their first MAX_PREFIX characters and then verified
+MAX_PREFIX = 12
+# Infix matches ("son" in "johnson") go through a trigram index
+NGRAM = 3
+
+# Score contributions per matched query term
+EXACT_SCORE = 3.0
+PREFIX_SCORE = 2.0
+INFIX_SCORE = 1.0
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """Lower-cased alphanumeric tokens of text"""
+    return TOKEN_PATTERN.findall(str(text).lower()) if text else []
+
+
+def ngrams(token):
+    return {token[i:i + NGRAM] for i in range(len(token) - NGRAM + 1)}
+
+
+class SearchIndex:
+    """
+    In-memory inverted index for type-ahead search over a few text fields.
+
+    Documents are indexed once by token prefix and by trigram, then kept current with
+    add/remove as rows change. A query is answered by intersecting the posting sets of
+    its terms, so lookups cost the size of the matches rather than of the table.
+    """
+
+    def __init__(self, field_weights):
+        """
+        Args:
+            field_weights (dict): Field name -> weight applied to matches in that field
+        """
+        self.field_weights = dict(field_weights)
+        self.prefixes = defaultdict(set)
+        self.grams = defaultdict(set)
+        # doc_id -> {token: best field weight}, used for scoring and removal
+        self.documents = {}
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.documents)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.documents
+
+    def add(self, doc_id, fields):
+        """Index (or re-index) a document from a dict of field values"""
+        tokens = {}
+        for field, weight in self.field_weights.items():
+            for token in tokenize(fields.get(field)):
+                tokens[token] = max(tokens.get(token, 0), weight)
+
+        with self.lock:
+            if doc_id in self.documents:
+                self._unindex(doc_id)
+            self.documents[doc_id] = tokens
+            for token in tokens:
+                for end in range(1, min(len(token), MAX_PREFIX) + 1):
+                    self.prefixes[token[:end]].add(doc_id)
+                for gram in ngrams(token):
+                    self.grams[gram].add(doc_id)
+
+    def remove(self, doc_id):
+        with self.lock:
+            if doc_id in self.documents:
+                self._unindex(doc_id)
+                del self.documents[doc_id]
+
+    def _unindex(self, doc_id):
+        for token in self.documents[doc_id]:
+            for end in range(1, min(len(token), MAX_PREFIX) + 1):
+                postings = self.prefixes.get(token[:end])
+                if postings is not None:
+                    postings.discard(doc_id)
+                    if not postings:
+                        del self.prefixes[token[:end]]
+            for gram in ngrams(token):
+                postings = self.grams.get(gram)
+                if postings is not None:
+                    postings.discard(doc_id)
+                    if not postings:
+                        del self.grams[gram]
+
+    def _candidates(self, term):
+        """Documents that may contain term as a token prefix or infix"""
+        candidates = set(self.prefixes.get(term[:MAX_PREFIX], ()))
+        if len(term) >= NGRAM:
+            grams = sorted(ngrams(term), key=lambda gram: len(self.grams.get(gram, ())))
+            infix = set(self.grams.get(grams[0], ()))
+            for gram in grams[1:]:
+                if not infix:
+                    break
+                infix &= self.grams.get(gram, set())
+            candidates |= infix
+        return candidates
+
+    def _term_score(self, doc_id, term):
+        best = 0.0
+        for token, weight in self.documents[doc_id].items():
+            if token == term:
+                score = EXACT_SCORE
+            elif token.startswith(term):
+                score = PREFIX_SCORE
+            elif len(term) >= NGRAM and term in token:
+                score = INFIX_SCORE
+            else:
+                continue
+            best = max(best, score * weight)
+        return best
+
+    def search(self, query, limit=None):
+        """
+        Ids of documents matching every term of query, best matches first.
+
+        Returns None for an empty query so callers can tell "no filter" from "no matches".
+        """
+        terms = tokenize(query)
+        if not terms:
+            return None
+
+        with self.lock:
+            # Most selective term first keeps the running intersection small
+            candidate_sets = sorted((self._candidates(term) for term in terms), key=len)
+            matches = candidate_sets[0]
+            for candidates in candidate_sets[1:]:
+                if not matches:
+                    break
+                matches = matches & candidates
+
+            scored = []
+            for doc_id in matches:
+                total = 0.0
+                for term in terms:
+                    score = self._term_score(doc_id, term)
+                    if not score:
+                        break
+                    total += score
+                else:
+                    scored.append((-total, doc_id))
+
+        scored.sort()
+        ids = [doc_id for _, doc_id in scored]
+        return ids[:limit] if limit else ids
+
+
+class Debouncer:
+    """
+    Run callback only once calls have stopped arriving for delay seconds.
+
+    The wait happens on a short-lived timer thread. If an executor is given, the
+    callback is handed to it instead of running on that thread, so callbacks that
+    hit the database reuse the executor's connection rather than opening one per
+    timer thread.
+    """
+
+    def __init__(self, delay, callback, executor=None):
+        self.delay = delay
+        self.callback = callback
+        self.executor = executor
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+            self.timer = threading.Timer(self.delay, self.fire, args, kwargs)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def fire(self, *args, **kwargs):
+        if self.executor is None:
+            self.callback(*args, **kwargs)
+        else:
+            self.executor.submit(self.callback, *args, **kwargs)
+
+    def cancel(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
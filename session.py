@@ -0,0 +1,129 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+
+# Sessions expire after this long without activity (seconds)
+SESSION_TTL_SECONDS = 8 * 60 * 60
+# Setting this enables a signed token on disk so a restart skips the login screen
+SESSION_SECRET_ENV = "MEDICARE_SESSION_SECRET"
+SESSION_TOKEN_PATH = ".medicare_session"
+
+
+class SessionManager:
+    """
+    Logged-in users held in memory, keyed by the Flet page session id.
+
+    Each browser tab (web mode) or window gets its own session. Sessions slide
+    forward on every access and are dropped once idle for `ttl` seconds. When a
+    secret is configured, the user id is also saved as an HMAC-signed token so
+    the desktop app can restore the session after a restart. The token file is
+    shared by every session of the process, so callers pass persist=False in web
+    mode, where it would sign each new browser in as the last user.
+    """
+
+    def __init__(self, ttl=SESSION_TTL_SECONDS, secret=None, token_path=SESSION_TOKEN_PATH):
+        self.ttl = ttl
+        self.secret = secret.encode() if isinstance(secret, str) else secret
+        self.token_path = token_path
+        self.sessions = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(secret=os.environ.get(SESSION_SECRET_ENV) or None)
+
+    def start(self, key, user, persist=True):
+        """Store user as the session for key, and save a token if enabled"""
+        with self.lock:
+            self.sessions[key] = {"user": dict(user), "expires_at": time.monotonic() + self.ttl}
+        if persist and self.secret:
+            self.save_token(user["id"])
+
+    def get(self, key):
+        """The session's user, or None if there is none or it has expired"""
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is None:
+                return None
+            now = time.monotonic()
+            if session["expires_at"] <= now:
+                del self.sessions[key]
+                return None
+            session["expires_at"] = now + self.ttl
+            return session["user"]
+
+    def end(self, key, persist=True):
+        """Drop the session and, if persist, its saved token"""
+        with self.lock:
+            self.sessions.pop(key, None)
+        if persist and self.secret and os.path.exists(self.token_path):
+            os.remove(self.token_path)
+
+    def purge_expired(self):
+        now = time.monotonic()
+        with self.lock:
+            for key in [key for key, session in self.sessions.items() if session["expires_at"] <= now]:
+                del self.sessions[key]
+
+    def sign(self, payload):
+        return hmac.new(self.secret, payload, hashlib.sha256).hexdigest()
+
+    def issue_token(self, user_id):
+        """Signed token carrying the user id and its wall-clock expiry"""
+        claims = {"uid": user_id, "exp": int(time.time() + self.ttl)}
+        payload = base64.urlsafe_b64encode(json.dumps(claims).encode())
+        return f"{payload.decode()}.{self.sign(payload)}"
+
+    def verify_token(self, token):
+        """User id from a valid, unexpired token, otherwise None"""
+        try:
+            payload, signature = token.strip().rsplit(".", 1)
+            if not hmac.compare_digest(self.sign(payload.encode()), signature):
+                return None
+            claims = json.loads(base64.urlsafe_b64decode(payload.encode()))
+            if claims["exp"] <= time.time():
+                return None
+            return claims["uid"]
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def save_token(self, user_id):
+        try:
+            with open(self.token_path, "w") as f:
+                f.write(self.issue_token(user_id))
+        except OSError as e:
+            print(f"Error saving session token: {e}")
+
+    def restore(self, key, db, persist=True):
+        """
+        Start a session for key from the saved token, if there is a valid one.
+
+        Returns:
+            dict: The restored user (id, name, email, role), or None (always with persist=False)
+        """
+        if not persist or not self.secret or not os.path.exists(self.token_path):
+            return None
+        try:
+            with open(self.token_path) as f:
+                user_id = self.verify_token(f.read())
+        except OSError as e:
+            print(f"Error reading session token: {e}")
+            return None
+        if user_id is None:
+            return None
+
+        user = db.get_user(user_id=user_id)
+        if not user or str(user.get("status", "")).lower() != "active":
+            return None
+        user = {field: user[field] for field in ("id", "name", "email", "role")}
+        # Re-issue the token so an active user's session keeps sliding forward
+        self.start(key, user)
+        return user
+
+
+# Shared by the login screen and every view of the main app
+sessions = SessionManager.from_env()
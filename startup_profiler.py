@@ -0,0 +1,96 @@
+import builtins
+import sys
+import threading
+import time
+
+# Pass this flag to main.py or app.py to print a startup report
+PROFILE_FLAG = "--profile-startup"
+# Slowest imports listed in the report
+REPORT_TOP_IMPORTS = 15
+
+
+class StartupProfiler:
+    """
+    Measures cold start: how long each top-level import takes and when startup
+    milestones (login screen, first dashboard paint, ...) are reached.
+
+    Imports are timed by wrapping builtins.__import__. Only modules that are not
+    yet loaded are recorded; each time includes the module's own imports, and the
+    nesting depth is kept so the report can show which import pulled in which.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.imports = []
+        self.marks = []
+        self.depth = threading.local()
+        self.lock = threading.Lock()
+        self.reported = False
+        self.original_import = None
+
+    def install(self):
+        self.original_import = builtins.__import__
+        builtins.__import__ = self.timed_import
+
+    def uninstall(self):
+        if self.original_import is not None:
+            builtins.__import__ = self.original_import
+            self.original_import = None
+
+    def timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level or name in sys.modules:
+            return self.original_import(name, globals, locals, fromlist, level)
+
+        depth = getattr(self.depth, "value", 0)
+        self.depth.value = depth + 1
+        start = time.perf_counter()
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            self.depth.value = depth
+            with self.lock:
+                self.imports.append((time.perf_counter() - start, depth, name))
+
+    def mark(self, label):
+        with self.lock:
+            self.marks.append((time.perf_counter() - self.started, label))
+
+    def report(self):
+        with self.lock:
+            if self.reported:
+                return
+            self.reported = True
+            imports = sorted(self.imports, reverse=True)
+            marks = list(self.marks)
+
+        total = sum(elapsed for elapsed, depth, _ in imports if depth == 0)
+        print(f"\n=== Startup profile ({total * 1000:.0f} ms in imports) ===")
+        print("  --- slowest imports (cumulative, indented by nesting) ---")
+        for elapsed, depth, name in imports[:REPORT_TOP_IMPORTS]:
+            print(f"  {'  ' * depth + name:<47} {elapsed * 1000:8.1f} ms")
+        print("  --- milestones (since profiling started) ---")
+        for elapsed, label in marks:
+            print(f"  {label:<47} {elapsed * 1000:8.1f} ms")
+
+
+profiler = None
+
+
+def start_if_requested(argv=None):
+    """Start profiling when the startup flag was passed; safe to call more than once"""
+    global profiler
+    argv = sys.argv if argv is None else argv
+    if profiler is None and PROFILE_FLAG in argv:
+        profiler = StartupProfiler()
+        profiler.install()
+    return profiler
+
+
+def mark(label, final=False):
+    """Record a startup milestone; final=True also prints the report and stops timing imports"""
+    if profiler is None:
+        return
+    profiler.mark(label)
+    if final:
+        profiler.uninstall()
+        profiler.report()
@@ -0,0 +1,55 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+from db_utils import HospitalDB
+
+
+class ArAgingRefreshTest(unittest.TestCase):
+    """Incremental AR aging refresh picks up bills changed by writers outside HospitalDB"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with redirect_stdout(io.StringIO()):
+            self.db = HospitalDB(os.path.join(tmp.name, "hospital.db"))
+            self.patient_id = self.db.add_patient("Test Patient")
+            bill_id = self.db.add_bill(self.patient_id, 100.0)
+            # A newer bill of another patient moves the refresh watermark past this one
+            self.db.add_bill(self.db.add_patient("Other Patient"), 20.0)
+        self.addCleanup(self.db.close)
+        conn, cursor = self.db.ensure_connection()
+        cursor.execute("UPDATE billing SET updated_at = '2000-01-01 00:00:00' WHERE id = ?", (bill_id,))
+        conn.commit()
+
+    def outstanding(self):
+        with redirect_stdout(io.StringIO()):
+            rows = self.db.get_ar_aging()
+        return sum(row["total_outstanding"] for row in rows if row["patient_id"] == self.patient_id)
+
+    def test_status_change_without_updated_at_is_refreshed(self):
+        self.assertEqual(self.outstanding(), 100.0)
+
+        conn, cursor = self.db.ensure_connection()
+        cursor.execute("UPDATE billing SET payment_status = 'paid' WHERE patient_id = ?", (self.patient_id,))
+        conn.commit()
+
+        self.assertEqual(self.outstanding(), 0)
+
+    def test_insert_without_updated_at_is_refreshed(self):
+        self.assertEqual(self.outstanding(), 100.0)
+
+        conn, cursor = self.db.ensure_connection()
+        cursor.execute(
+            "INSERT INTO billing (patient_id, amount, payment_status, bill_date) VALUES (?, 50.0, 'pending', ?)",
+            (self.patient_id, "2000-01-01")
+        )
+        conn.commit()
+
+        self.assertEqual(self.outstanding(), 150.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
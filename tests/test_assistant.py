@@ -0,0 +1,73 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+import assistant
+
+
+class StreamMessageTest(unittest.TestCase):
+    """stream_message driven through the fake backend, without the Gemini SDK"""
+
+    def setUp(self):
+        patcher = mock.patch.object(assistant, "FAKE_CHUNK_DELAY", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_yields_chunks_in_order(self):
+        expected = assistant.FakeChatSession().send_message("normal BP?", stream=True).chunks
+
+        with redirect_stdout(io.StringIO()):
+            chunks = list(assistant.stream_message(assistant.FakeChatSession(), "normal BP?"))
+
+        self.assertEqual(chunks, expected)
+        self.assertGreater(len(chunks), 1)
+
+    def test_final_text_is_the_whole_reply(self):
+        session = assistant.FakeChatSession()
+
+        with redirect_stdout(io.StringIO()):
+            text = "".join(assistant.stream_message(session, "normal BP?"))
+
+        self.assertTrue(text.startswith("**Fake assistant** received: normal BP?"))
+        self.assertEqual(session.history[-1], {"role": "model", "parts": [text]})
+
+    def test_usage_logged_once_after_last_chunk(self):
+        output = io.StringIO()
+        with redirect_stdout(output):
+            stream = assistant.stream_message(assistant.FakeChatSession(), "normal BP?")
+            chunks = [next(stream)]
+            self.assertEqual(output.getvalue(), "")
+            chunks.extend(stream)
+
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 1)
+        # The fake backend counts the user turn's words as prompt tokens and each chunk as one
+        prompt, response = 2, len(chunks)
+        self.assertEqual(
+            lines[0], f"Gemini tokens: prompt={prompt} response={response} total={prompt + response}"
+        )
+
+    def test_chunks_without_text_are_skipped(self):
+        class NoText:
+            @property
+            def text(self):
+                raise ValueError("no text parts")
+
+        class Response(assistant.FakeResponse):
+            def __iter__(self):
+                yield NoText()
+                yield from super().__iter__()
+
+        session = mock.Mock()
+        session.send_message.return_value = Response(["a ", "b"], prompt_tokens=1, delay=0)
+
+        with redirect_stdout(io.StringIO()):
+            chunks = list(assistant.stream_message(session, "hi"))
+
+        self.assertEqual(chunks, ["a ", "b"])
+        session.send_message.assert_called_once_with("hi", stream=True)
+
+
+if __name__ == "__main__":
+    unittest.main()